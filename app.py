@@ -1,4 +1,10 @@
-from project import app
+import os
+
+# `python app.py` runs the development server in debug mode, where the development secret key is allowed.
+if __name__ == "__main__":
+    os.environ.setdefault("FLASK_DEBUG", "1")
+
+from project import app  # noqa: E402
 
 
 if __name__ == "__main__":
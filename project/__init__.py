@@ -5,6 +5,8 @@ from flask import Flask
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from project.routing import RoutingSession, init_replicas
+from project.sessions import init_sessions
 
 ##### Dirs
 base_path = os.path.abspath(os.path.dirname(__file__))
@@ -16,11 +18,28 @@ db = SQLAlchemy(model_class=Base)
 
 ##### App
 app = Flask(__name__)
-#! Change this
-app.config['SECRET_KEY'] = "mysecretkey"
+# Set FLASK_SECRET_KEY in production, every worker must use the same key.
+app.config['SECRET_KEY'] = None
 app.config['SQLALCHEMY_DATABASE_URI'] = db_path
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.__init__(app)
+# Comma separated, e.g. "sqlite:////tmp/replica.db". Reads of read only views are spread over them.
+app.config['SQLALCHEMY_REPLICA_URIS'] = [
+    uri for uri in os.environ.get("REPLICA_DATABASE_URIS", "").split(",") if uri
+]
+app.config['REPLICA_STICKY_SECONDS'] = 10
+app.config['VIEW_COUNTS_FLUSH_SECONDS'] = 5
+# "memory" (one process), "sqlite" (instance/sessions.db, one node) or "redis" (SESSION_REDIS_URL)
+app.config['SESSION_BACKEND'] = "sqlite"
+# Any setting can be overridden by an environment variable, e.g. FLASK_SESSION_BACKEND=redis
+app.config.from_prefixed_env()
+if not app.config['SECRET_KEY']:
+    if not (app.debug or app.testing):
+        raise RuntimeError("FLASK_SECRET_KEY must be set, the development key is only used in debug mode")
+    app.logger.warning("FLASK_SECRET_KEY is not set, using the development key")
+    app.config['SECRET_KEY'] = "dev-secret-key"
+db.__init__(app, session_options={"class_": RoutingSession})
+init_replicas(app)
+init_sessions(app)
 Migrate(app,db)
 
 ##### Login
@@ -33,19 +52,29 @@ from project.core.views import core
 from project.users.views import users
 from project.posts.views import blog_posts
 from project.error_pages.handlers import error_pages
+from project.feeds.views import feeds
 
 app.register_blueprint(core)
 app.register_blueprint(users)
 app.register_blueprint(blog_posts)
 app.register_blueprint(error_pages)
+app.register_blueprint(feeds)
 
 ##### API
-from project.api import UserPostsApi,CreateUserApi, ManageUsersApi, CreatePostApi
+from project.api import UserPostsApi,CreateUserApi, ManageUsersApi, CreatePostApi, AvailabilityApi, UserStatsApi
 api = Api(app)
 api.add_resource(UserPostsApi, "/api/getuserposts/<username>")
 api.add_resource(CreateUserApi, "/api/createuser")
 api.add_resource(ManageUsersApi, "/api/<username>")
+api.add_resource(UserStatsApi, "/api/<username>/stats")
 api.add_resource(CreatePostApi, "/api/createpost")
+api.add_resource(AvailabilityApi, "/api/availability")
+
+##### CLI
+from project.jobs.commands import jobs_cli
+from project.maintenance.commands import blog_cli
+app.cli.add_command(jobs_cli)
+app.cli.add_command(blog_cli)
 
 ##### Create DB
 with app.app_context():
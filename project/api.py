@@ -1,14 +1,20 @@
-from flask import jsonify, request, make_response
+from flask import abort, jsonify, request, make_response
 from flask_restful import Resource
 from project.models import User, BlogPost
-from project.users.picture_handler import picture_from_url
+from project.jobs.queue import enqueue
+from project.routing import read_only
+from project.posts.rendering import render_post
+from project.posts import indexing
 from project import db
+from project import repository
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 
 
 # The `UserPostsApi` class is a Flask resource that retrieves all blog posts associated with a given
 # username.
 class UserPostsApi(Resource):
+    @read_only
     def get(self, username:str):
         """
         The function retrieves all blog posts associated with a given username and returns them as a
@@ -19,8 +25,10 @@ class UserPostsApi(Resource):
         response will include the message "user has no posts yet". If the user has posts, the response
         will include a list of JSON objects representing each post.
         """
-        user: User = User.query.filter_by(username=username).one_or_404()
-        posts: list[BlogPost] = BlogPost.query.filter_by(user_id=user.id).all()
+        user_id = repository.get_user_id(username)
+        if user_id is None:
+            abort(404)
+        posts: list[BlogPost] = BlogPost.query.filter_by(user_id=user_id).all()
         if len(posts) == 0:
             return make_response(jsonify({"info": "user has no posts yet"}))
         return make_response(jsonify([post.json() for post in posts]))
@@ -28,6 +36,7 @@ class UserPostsApi(Resource):
 
 # The `ManageUsersApi` class provides methods to retrieve and delete user information from a database.
 class ManageUsersApi(Resource):
+    @read_only
     def get(self, username: str):
         """
         The function retrieves a user with a specific username and returns their information in JSON
@@ -37,26 +46,68 @@ class ManageUsersApi(Resource):
         the database
         :return: a response object that contains the JSON representation of the user object.
         """
-        user: User = User.query.filter_by(username=username).one_or_404()
-        return make_response(jsonify(user.json()))
+        user = repository.get_user_summary(username)
+        if user is None:
+            abort(404)
+        resp_data = {
+            "user_id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "profile_img": user.profile_img,
+            "created_at": user.created_at,
+            "posts": user.posts,
+        }
+        return make_response(jsonify(resp_data))
 
     # TODO: only available with jwt_auth
     def delete(self, username: str):
         """
-        The `delete` function deletes a user from the database based on their username and returns a
-        success message.
+        The `delete` function soft deletes a user based on their username and returns a success message.
+        The user is hidden from every query right away, their posts and avatar are purged in batches by
+        the `purge_user` background job.
         
         :param username: The `username` parameter is a string that represents the username of the user
         you want to delete from the database
         :return: a response object with a JSON payload indicating that the deletion was successful. The
         JSON payload includes a "success" key with the value "Deleted successfully."
         """
-        user: User = User.query.filter_by(username=username).one_or_404()
-        db.session.delete(user)
+        user = repository.get_user_by_username(username)
+        if user is None:
+            abort(404)
+        indexing.author_hidden(user.id)
+        user.deleted_at = datetime.now()
+        enqueue("purge_user", user_id=user.id)
         db.session.commit()
         return make_response(jsonify(success = "Deleted successfully."))
 
 
+# The `UserStatsApi` class serves the precomputed statistics of an author.
+class UserStatsApi(Resource):
+    @read_only
+    def get(self, username: str):
+        """
+        The function returns the statistics of the posts of a user: number of posts, words, first and
+        last post dates and posts per month. They are read from `author_stats`, never computed from the
+        posts.
+
+        :param username: The `username` parameter is the username of the author
+        :return: a response object with the JSON statistics, or 404 if there is no such user.
+        """
+        user_id = repository.get_user_id(username)
+        if user_id is None:
+            abort(404)
+        months = request.args.get("months", 12, int)
+        stats, per_month = repository.get_author_stats(user_id, max(0, min(months, 120)))
+        resp_data = {
+            "username": username,
+            **stats.json(),
+            "posts_per_month": [
+                {"year": year, "month": month, "posts": count} for year, month, count in per_month
+            ],
+        }
+        return make_response(jsonify(resp_data))
+
+
 # The CreateUserApi class is a resource for creating user accounts.
 class CreateUserApi(Resource):
     def post(self):
@@ -83,10 +134,6 @@ class CreateUserApi(Resource):
             resp_data = jsonify(error= "must provide username, email and password")
             return make_response(resp_data,404)
 
-        if picture_url:
-            profile_pic = picture_from_url(picture_url, username)
-            user.profile_img = profile_pic
-
         if created_at:
             try:
                 date = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
@@ -95,7 +142,17 @@ class CreateUserApi(Resource):
                 resp_data = jsonify(error = "date format was not valid.",format = "%Y-%m-%d %H:%M:%S")
                 return make_response(resp_data, 404)
         db.session.add(user)
-        db.session.commit()
+        try:
+            if picture_url:
+                # Downloading and resizing the picture is left to a worker. The flush already hits the
+                # unique constraints.
+                db.session.flush()
+                enqueue("fetch_profile_picture", user_id=user.id, url=picture_url)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            resp_data = jsonify(error = "email or username already registered.")
+            return make_response(resp_data, 409)
         resp_data = jsonify({"success": "user created successfully", "user": user.json()})
         return make_response(resp_data, 200)
     
@@ -121,8 +178,15 @@ class CreatePostApi(Resource):
         title = json.get("title")
         text = json.get("text")
         created_at = json.get("created_at")
+        tags = json.get("tags")
+        if tags is not None and not (
+            isinstance(tags, str) or (isinstance(tags, list) and all(isinstance(t, str) for t in tags))
+        ):
+            resp_data = jsonify(error = "tags must be a comma separated string or a list of strings")
+            return make_response(resp_data, 404)
         if user_id and title and text:
             post = BlogPost(user_id, title, text) 
+            render_post(post)
         else:
             resp_data = jsonify(error = "must provide user_id, title and text")
             return make_response(resp_data, 404)
@@ -134,6 +198,33 @@ class CreatePostApi(Resource):
                 resp_data = jsonify({"error": "date format was not valid.","format": "%Y-%m-%d %H:%M:%S"})
                 return make_response(resp_data, 404)
         db.session.add(post)
+        db.session.flush()
+        indexing.post_added(post, indexing.parse_tags(tags))
         db.session.commit()
         resp_data = jsonify({"success": "post created successfully", "post": post.json()})
-        return make_response(resp_data, 200)
\ No newline at end of file
+        return make_response(resp_data, 200)
+
+
+# The `AvailabilityApi` class lets the registration page check usernames and emails while they are typed.
+class AvailabilityApi(Resource):
+    @read_only
+    def get(self):
+        """
+        The function checks whether the `username` and/or `email` query arguments are still available,
+        with a single query that only reads the unique indexes.
+
+        :return: a response with a JSON object mapping each given argument to whether it is available.
+        If neither argument is given, an error is returned with a status code of 404.
+        """
+        username = request.args.get("username")
+        email = request.args.get("email")
+        if not username and not email:
+            resp_data = jsonify(error = "must provide username or email")
+            return make_response(resp_data, 404)
+        taken = repository.taken(email, username)
+        resp_data = {}
+        if username:
+            resp_data["username"] = not taken.username
+        if email:
+            resp_data["email"] = not taken.email
+        return make_response(jsonify(resp_data))
@@ -1,21 +1,41 @@
-from project import app
+from sqlalchemy import select
+from project import app, db
 from flask import render_template, request, Blueprint
-from project.models import BlogPost
+from project.models import BlogPost, PostViews
+from project.routing import read_only
 
 core = Blueprint("core", __name__)
 
 
 @core.route("/")
+@read_only
 def index():
     page = request.args.get("page", 1, int)
     with app.app_context():
-        posts = BlogPost.query.order_by(BlogPost.created_at.desc()).paginate(
+        posts = BlogPost.query.order_by(BlogPost.created_at.desc(), BlogPost.id.desc()).paginate(
             page=page, per_page=5
         )
         # posts.iter_pages()
         return render_template("index.html", posts=posts)
 
 
+@core.route("/popular")
+@read_only
+def popular():
+    with app.app_context():
+        posts = (
+            db.session.execute(
+                select(BlogPost, PostViews.views)
+                .join(PostViews, PostViews.post_id == BlogPost.id)
+                .order_by(PostViews.views.desc())
+                .limit(10)
+            )
+            .tuples()
+            .all()
+        )
+        return render_template("popular.html", posts=posts)
+
+
 @core.route("/info")
 def info():
     return render_template("info.html")
@@ -0,0 +1,87 @@
+"""
+Cache invalidation for the sitemaps and feeds
+- Bump the "content" version in the same transaction as any post or user write
+- Keep small generated documents in memory until the version changes
+"""
+
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from project import db
+from project.models import BlogPost, CacheVersion, User
+from project.routing import RoutingSession
+
+CONTENT = "content"
+
+_tracked = (BlogPost, User)
+_tracked_tables = {BlogPost.__table__, User.__table__}
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    if any(isinstance(obj, _tracked) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["content_changed"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_dml(orm_execute_state):
+    if (
+        (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete)
+        and getattr(orm_execute_state.statement, "table", None) in _tracked_tables
+    ):
+        orm_execute_state.session.info["content_changed"] = True
+
+
+@event.listens_for(RoutingSession, "before_commit")
+def _bump_content_version(session):
+    pending = (*session.new, *session.dirty, *session.deleted)
+    if session.info.pop("content_changed", False) or any(isinstance(obj, _tracked) for obj in pending):
+        stmt = insert(CacheVersion).values(name=CONTENT, version=1)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CacheVersion.name],
+                set_={"version": CacheVersion.version + 1},
+            )
+        )
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _clear_mark(session):
+    session.info.pop("content_changed", None)
+
+
+def content_version() -> int:
+    """
+    The function `content_version` returns the current version of the posts and users data.
+    """
+    return db.session.scalar(select(CacheVersion.version).where(CacheVersion.name == CONTENT)) or 0
+
+
+# The `DocumentCache` class is a small LRU cache of generated documents, each stored with the content
+# version it was generated from. A document of an older version is never returned.
+class DocumentCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+
+    def get(self, key: str, version: int) -> bytes | None:
+        """
+        The function returns the document cached under `key` if it was generated from `version`.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, version: int, body: bytes):
+        """
+        The function caches `body` under `key`, evicting the least recently used document when full.
+        """
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+documents = DocumentCache()
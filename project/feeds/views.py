@@ -0,0 +1,224 @@
+"""
+For crawlers and feed readers
+- Sitemap (a sitemap index of id range shards past 50k urls)
+- Site and author Atom/RSS feeds
+
+Documents are written element by element while the rows are read with `yield_per`, and carry the
+content version as ETag so unchanged documents are answered with 304 Not Modified.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from itertools import chain
+from typing import Iterator
+from xml.sax.saxutils import escape, quoteattr
+from flask import Blueprint, Response, abort, request, stream_with_context, url_for
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from project import db, repository
+from project.feeds.cache import content_version, documents
+from project.models import ArchiveMonth, BlogPost, User
+from project.routing import read_only, read_only_stream
+
+feeds = Blueprint("feeds", __name__)
+
+SITEMAP_MAX_URLS = 50000
+STATIC_ENDPOINTS = ("core.index", "core.popular", "core.info", "blog_posts.tags", "blog_posts.archive")
+FEED_ENTRIES = 20
+YIELD_PER = 1000
+
+
+def _not_modified(etag: str) -> bool:
+    return request.if_none_match.contains(etag)
+
+
+def _xml_response(body, mimetype: str, etag: str) -> Response:
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, no-cache"
+    return response
+
+
+def _element(tag: str, text, **attrs) -> str:
+    attributes = "".join(f" {name}={quoteattr(str(value))}" for name, value in attrs.items())
+    if text is None:
+        return f"<{tag}{attributes}/>"
+    return f"<{tag}{attributes}>{escape(str(text))}</{tag}>"
+
+
+def _utc(moment: datetime) -> datetime:
+    # Dates are stored as naive local times.
+    return moment.astimezone(timezone.utc)
+
+
+def _url(loc: str, lastmod: datetime | None = None) -> str:
+    lastmod_element = _element("lastmod", _utc(lastmod).date().isoformat()) if lastmod else ""
+    return f"<url>{_element('loc', loc)}{lastmod_element}</url>\n"
+
+
+##### Sitemaps
+
+
+def _post_urls(first_id: int = 1, last_id: int | None = None) -> Iterator[str]:
+    stmt = select(BlogPost.id, BlogPost.created_at).where(BlogPost.id >= first_id).order_by(BlogPost.id)
+    if last_id is not None:
+        stmt = stmt.where(BlogPost.id <= last_id)
+    for post_id, created_at in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield _url(url_for("blog_posts.view", blog_post_id=post_id, _external=True), created_at)
+
+
+def _user_urls(first_id: int = 1, last_id: int | None = None) -> Iterator[str]:
+    stmt = select(User.id, User.username).where(User.id >= first_id).order_by(User.id)
+    if last_id is not None:
+        stmt = stmt.where(User.id <= last_id)
+    for _, username in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield _url(url_for("users.posts", username=username, _external=True))
+
+
+def _urlset(urls: Iterator[str]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    yield from urls
+    yield "</urlset>\n"
+
+
+def _static_urls() -> Iterator[str]:
+    for endpoint in STATIC_ENDPOINTS:
+        yield _url(url_for(endpoint, _external=True))
+
+
+# Shards are id ranges, so each one holds at most SITEMAP_MAX_URLS urls whatever was deleted. The user
+# shards leave room for the static urls listed in the first one.
+SHARDS = {
+    "users": (User, SITEMAP_MAX_URLS - len(STATIC_ENDPOINTS)),
+    "posts": (BlogPost, SITEMAP_MAX_URLS),
+}
+
+
+def _shards(kind: str) -> int:
+    model, size = SHARDS[kind]
+    max_id = db.session.scalar(select(func.max(model.id))) or 0
+    return -(-max_id // size)
+
+
+@feeds.route("/sitemap.xml")
+@read_only
+def sitemap():
+    etag = f"sitemap-{content_version()}"
+    if _not_modified(etag):
+        return Response(status=304)
+    # The month counts are maintained incrementally, summing them avoids counting the posts table.
+    n_posts = db.session.scalar(select(func.sum(ArchiveMonth.post_count))) or 0
+    n_users = db.session.scalar(select(func.count(User.id))) or 0
+    if n_posts + n_users + len(STATIC_ENDPOINTS) <= SITEMAP_MAX_URLS:
+        urls = _urlset(chain(_static_urls(), _user_urls(), _post_urls()))
+        return _xml_response(stream_with_context(read_only_stream(urls)), "application/xml", etag)
+
+    def index():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for kind in SHARDS:
+            for shard in range(_shards(kind)):
+                loc = url_for("feeds.sitemap_shard", kind=kind, shard=shard, _external=True)
+                yield f"<sitemap>{_element('loc', loc)}</sitemap>\n"
+        yield "</sitemapindex>\n"
+
+    return _xml_response(stream_with_context(read_only_stream(index())), "application/xml", etag)
+
+
+@feeds.route("/sitemap-<kind>-<int:shard>.xml")
+@read_only
+def sitemap_shard(kind, shard):
+    if kind not in SHARDS:
+        abort(404)
+    etag = f"sitemap-{kind}-{shard}-{content_version()}"
+    if _not_modified(etag):
+        return Response(status=304)
+    size = SHARDS[kind][1]
+    first_id = shard * size + 1
+    last_id = first_id + size - 1
+    urls = _user_urls(first_id, last_id) if kind == "users" else _post_urls(first_id, last_id)
+    if shard == 0 and kind == "users":
+        urls = chain(_static_urls(), urls)
+    return _xml_response(stream_with_context(read_only_stream(_urlset(urls))), "application/xml", etag)
+
+
+##### Feeds
+
+
+def _feed_posts(user_id: int | None) -> Iterator[BlogPost]:
+    stmt = (
+        select(BlogPost)
+        .options(joinedload(BlogPost.author))
+        .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+        .limit(FEED_ENTRIES)
+    )
+    if user_id is not None:
+        stmt = stmt.where(BlogPost.user_id == user_id)
+    return db.session.scalars(stmt)
+
+
+def _atom(title: str, link: str, feed_url: str, posts: Iterator[BlogPost]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield _element("title", title) + _element("id", feed_url)
+    yield _element("link", None, href=link) + _element("link", None, href=feed_url, rel="self")
+    yield _element("updated", datetime.now(timezone.utc).isoformat(timespec="seconds")) + "\n"
+    for post in posts:
+        post_url = url_for("blog_posts.view", blog_post_id=post.id, _external=True)
+        yield "<entry>"
+        yield _element("title", post.title) + _element("id", post_url)
+        yield _element("link", None, href=post_url)
+        yield _element("updated", _utc(post.created_at).isoformat(timespec="seconds"))
+        yield f"<author>{_element('name', post.author.username)}</author>"
+        yield _element("content", post.text_html or post.text, type="html")
+        yield "</entry>\n"
+    yield "</feed>\n"
+
+
+def _rss(title: str, link: str, posts: Iterator[BlogPost]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<rss version="2.0"><channel>\n'
+    yield _element("title", title) + _element("link", link)
+    yield _element("description", f"Latest posts of {title}") + "\n"
+    for post in posts:
+        post_url = url_for("blog_posts.view", blog_post_id=post.id, _external=True)
+        yield "<item>"
+        yield _element("title", post.title) + _element("link", post_url) + _element("guid", post_url)
+        yield _element("pubDate", format_datetime(_utc(post.created_at)))
+        yield _element("description", post.text_html or post.text)
+        yield "</item>\n"
+    yield "</channel></rss>\n"
+
+
+def _feed(fmt: str, title: str, link: str, user_id: int | None) -> Response:
+    if fmt not in ("atom", "rss"):
+        abort(404)
+    version = content_version()
+    etag = f"{request.path}-{version}"
+    if _not_modified(etag):
+        return Response(status=304)
+    mimetype = "application/atom+xml" if fmt == "atom" else "application/rss+xml"
+    body = documents.get(request.path, version)
+    if body is None:
+        posts = _feed_posts(user_id)
+        parts = _atom(title, link, request.base_url, posts) if fmt == "atom" else _rss(title, link, posts)
+        body = "".join(parts).encode()
+        documents.set(request.path, version, body)
+    return _xml_response(body, mimetype, etag)
+
+
+@feeds.route("/feed.<fmt>")
+@read_only
+def site_feed(fmt):
+    return _feed(fmt, "PuppyBlog", url_for("core.index", _external=True), None)
+
+
+@feeds.route("/<username>/feed.<fmt>")
+@read_only
+def author_feed(username, fmt):
+    user_id = repository.get_user_id(username)
+    if user_id is None:
+        abort(404)
+    link = url_for("users.posts", username=username, _external=True)
+    return _feed(fmt, f"PuppyBlog - @{username}", link, user_id)
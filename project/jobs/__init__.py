@@ -0,0 +1,2 @@
+# Register the tasks with the queue, so jobs can be enqueued whatever was imported first.
+from project.jobs import tasks  # noqa: F401
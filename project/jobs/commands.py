@@ -0,0 +1,85 @@
+"""
+CLI for the job queue
+- flask jobs work
+- flask jobs stats
+- flask jobs prune
+- flask jobs rerender
+- flask jobs gc-images
+"""
+
+import multiprocessing
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete
+from project import db
+from project.jobs.queue import enqueue, queue_stats, work
+from project.models import Job
+
+jobs_cli = AppGroup("jobs", help="Manage the background job queue.")
+
+
+@jobs_cli.command("work")
+@click.option("-w", "--workers", default=1, show_default=True, help="Number of worker processes.")
+@click.option("--poll", default=1.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+def work_command(workers: int, poll: float, burst: bool):
+    """Start worker processes that run queued jobs."""
+    if workers == 1:
+        work(poll_interval=poll, burst=burst)
+        return
+    procs = [
+        multiprocessing.Process(target=work, kwargs={"poll_interval": poll, "burst": burst})
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+            proc.join()
+
+
+@jobs_cli.command("stats")
+def stats_command():
+    """Show job counts by task and status and the queue lag."""
+    stats = queue_stats()
+    if not stats["counts"]:
+        click.echo("No jobs.")
+    for task_name, counts in sorted(stats["counts"].items()):
+        summary = " ".join(f"{status}={count}" for status, count in sorted(counts.items()))
+        click.echo(f"{task_name}: {summary}")
+    click.echo(f"lag: {stats['lag_seconds']:.1f}s")
+
+
+@jobs_cli.command("prune")
+@click.option("--days", default=7, show_default=True, help="Keep finished jobs this recent.")
+def prune_command(days: int):
+    """Delete finished jobs older than --days."""
+    cutoff = datetime.now() - timedelta(days=days)
+    result = db.session.execute(
+        delete(Job).where(Job.status.in_(("done", "failed")), Job.finished_at < cutoff)
+    )
+    db.session.commit()
+    click.echo(f"Deleted {result.rowcount} jobs.")  # type: ignore
+
+
+@jobs_cli.command("rerender")
+@click.option("--batch-size", default=500, show_default=True, help="Posts re-rendered per job.")
+def rerender_command(batch_size: int):
+    """Enqueue jobs re-rendering, a batch at a time, the posts rendered by an older renderer version."""
+    job = enqueue("rerender_posts", batch_size=batch_size)
+    db.session.commit()
+    click.echo(f"Enqueued job #{job.id}.")
+
+
+@jobs_cli.command("gc-images")
+@click.option("--grace", default=3600, show_default=True, help="Keep pictures younger than this (seconds).")
+def gc_images_command(grace: int):
+    """Enqueue a job deleting the profile pictures no user references."""
+    job = enqueue("collect_images", grace_seconds=grace)
+    db.session.commit()
+    click.echo(f"Enqueued job #{job.id}.")
@@ -0,0 +1,305 @@
+"""
+Database backed job queue
+- Register tasks
+- Enqueue jobs (inside the caller's transaction)
+- Lease jobs to workers
+- Run them with retries and exponential backoff
+"""
+
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import OperationalError
+from project import app, db
+from project.models import Job
+
+# Task name -> callable. Filled by the `task` decorator when `project.jobs.tasks` is imported, which
+# the package `__init__` does.
+TASKS: dict[str, Callable[..., None]] = {}
+# Task name -> callable run with the job's arguments once a job of the task failed for good.
+FAILURE_HANDLERS: dict[str, Callable[..., None]] = {}
+
+# Per process counters, logged when a worker stops.
+METRICS: dict[str, float] = {
+    "claimed": 0,
+    "succeeded": 0,
+    "retried": 0,
+    "failed": 0,
+    "lost": 0,
+    "busy_seconds": 0.0,
+}
+
+LEASE_SECONDS = 60
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 600.0
+
+
+def task(name: str | None = None, on_failure: Callable[..., None] | None = None):
+    """
+    The decorator `task` registers a function so workers can run it by name.
+
+    :param name: The `name` parameter is the name the task is stored under in the `jobs` table. It
+    defaults to the name of the decorated function
+    :param on_failure: The `on_failure` parameter is called with the job's arguments when a job of the
+    task fails for good, to clean up what the job would have consumed
+    :return: the decorated function unchanged.
+    """
+
+    def decorator(func: Callable[..., None]):
+        TASKS[name or func.__name__] = func
+        if on_failure is not None:
+            FAILURE_HANDLERS[name or func.__name__] = on_failure
+        return func
+
+    return decorator
+
+
+def enqueue(task_name: str, delay: float = 0, max_attempts: int = 5, **kwargs) -> Job:
+    """
+    The function `enqueue` adds a job to the current session without committing, so the job is stored
+    atomically with the write that produced it.
+
+    :param task_name: The `task_name` parameter is the name of a registered task
+    :param delay: The `delay` parameter is the number of seconds to wait before the job can run
+    :param max_attempts: The `max_attempts` parameter is the number of times the job is tried before
+    being marked as failed
+    :param kwargs: JSON serializable keyword arguments for the task
+    :return: the new `Job` object (its id is available after the caller flushes or commits).
+    """
+    if task_name not in TASKS:
+        raise LookupError(f"Unknown task {task_name!r}.")
+    run_at = datetime.now() + timedelta(seconds=delay)
+    job = Job(task_name, kwargs, run_at=run_at, max_attempts=max_attempts)
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts: int) -> float:
+    """
+    The function `backoff` returns the number of seconds to wait before retrying a job that already
+    failed `attempts` times, doubling every attempt and adding some jitter.
+    """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay + random.uniform(0, BACKOFF_BASE)
+
+
+def claim(worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Job | None:
+    """
+    The function `claim` leases the next runnable job to `worker_id`. Jobs whose lease expired (the
+    worker died while running them) are runnable again.
+
+    The lease is taken with a conditional UPDATE so two workers racing for the same row can never both
+    win it.
+
+    :return: the leased `Job` or None if there is nothing to do.
+    """
+    now = datetime.now()
+    runnable = or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+    candidates = db.session.scalars(
+        select(Job.id).where(runnable).order_by(Job.run_at).limit(10)
+    ).all()
+    for job_id in candidates:
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, runnable)
+            .values(
+                status="running",
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=Job.attempts + 1,
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:  # type: ignore
+            METRICS["claimed"] += 1
+            return db.session.get(Job, job_id)
+    return None
+
+
+# The `Heartbeat` class is a thread extending the lease of the job its worker is running, on its own
+# connection, until stopped. It beats three times per lease, so a busy database can miss a beat
+# without the lease expiring. It notes when the lease was taken over by another worker.
+class Heartbeat(threading.Thread):
+    def __init__(self, job_id: int, worker_id: str, lease_seconds: float = LEASE_SECONDS):
+        super().__init__(name=f"heartbeat-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._done = threading.Event()
+
+    def run(self):
+        jobs = Job.__table__
+        with app.app_context():
+            while not self._done.wait(self.lease_seconds / 3):
+                try:
+                    with db.engine.begin() as conn:
+                        result = conn.execute(
+                            update(jobs)
+                            .where(jobs.c.id == self.job_id, jobs.c.locked_by == self.worker_id)
+                            .values(locked_until=datetime.now() + timedelta(seconds=self.lease_seconds))
+                        )
+                except OperationalError as e:
+                    # The database was busy, the lease still has two beats of slack.
+                    app.logger.warning(f"Heartbeat of job #{self.job_id} failed: {e.orig}")
+                    continue
+                if result.rowcount == 0:
+                    self.lost = True
+                    app.logger.error(f"Job #{self.job_id} lost its lease, another worker may run it")
+                    return
+
+    def stop(self):
+        """
+        The function stops extending the lease and waits for the thread to exit.
+        """
+        self._done.set()
+        self.join()
+
+
+def _finish(job_id: int, worker_id: str, **values) -> bool:
+    # Only the worker still holding the lease may settle the job.
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(locked_by=None, locked_until=None, **values)
+    )
+    db.session.commit()
+    if result.rowcount == 0:  # type: ignore
+        METRICS["lost"] += 1
+        app.logger.error(
+            f"Job #{job_id} was leased to another worker before {worker_id} finished it, "
+            f"its outcome ({values.get('status')}) is discarded"
+        )
+        return False
+    return True
+
+
+def _on_failure(task_name: str, job_id: int, args: dict):
+    handler = FAILURE_HANDLERS.get(task_name)
+    if handler is None:
+        return
+    try:
+        handler(**args)
+    except Exception:
+        app.logger.exception(f"Failure handler of job {task_name} #{job_id} failed")
+
+
+def run_job(job: Job, worker_id: str, lease_seconds: float = LEASE_SECONDS):
+    """
+    The function `run_job` runs a leased job and records the outcome. A failing job is put back in the
+    queue with exponential backoff until it reaches `max_attempts`, then it is marked as failed.
+
+    A `Heartbeat` extends the lease while the task runs, so long tasks are not leased again to another
+    worker.
+    """
+    job_id, task_name, attempts, max_attempts = job.id, job.task, job.attempts, job.max_attempts
+    args = job.args
+    start = time.perf_counter()
+    heartbeat = Heartbeat(job_id, worker_id, lease_seconds)
+    heartbeat.start()
+    try:
+        try:
+            func = TASKS.get(task_name)
+            if func is None:
+                raise LookupError(f"Unknown task {task_name!r}.")
+            func(**args)
+            db.session.commit()
+        finally:
+            # Stopped before the job is settled: a beat after that would find the lease released.
+            heartbeat.stop()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()[-4000:]
+        if attempts >= max_attempts:
+            METRICS["failed"] += 1
+            app.logger.error(f"Job {task_name} #{job_id} failed for good: {error.splitlines()[-1]}")
+            if _finish(job_id, worker_id, status="failed", finished_at=datetime.now(), last_error=error):
+                _on_failure(task_name, job_id, args)
+        else:
+            METRICS["retried"] += 1
+            retry_at = datetime.now() + timedelta(seconds=backoff(attempts))
+            app.logger.warning(f"Job {task_name} #{job_id} failed, retrying at {retry_at}.")
+            _finish(job_id, worker_id, status="queued", run_at=retry_at, last_error=error)
+    else:
+        METRICS["succeeded"] += 1
+        _finish(job_id, worker_id, status="done", finished_at=datetime.now())
+    finally:
+        METRICS["busy_seconds"] += time.perf_counter() - start
+
+
+def work(worker_id: str | None = None, poll_interval: float = 1.0, burst: bool = False):
+    """
+    The function `work` is the worker loop: it keeps leasing and running jobs until it receives
+    SIGINT/SIGTERM, or until the queue is empty when `burst` is True.
+
+    :param worker_id: The `worker_id` parameter identifies the worker in the `locked_by` column. It
+    defaults to `<hostname>:<pid>`
+    :param poll_interval: The `poll_interval` parameter is the number of seconds to sleep when the
+    queue is empty
+    :param burst: The `burst` parameter makes the worker exit once there are no runnable jobs left
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    with app.app_context():
+        # Connections inherited from a forked parent must not be shared.
+        db.engine.dispose(close=False)
+        app.logger.info(f"Worker {worker_id} started")
+        while not stopping:
+            job = claim(worker_id)
+            if job is None:
+                if burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(job, worker_id)
+        app.logger.info(f"Worker {worker_id} stopped: {format_metrics()}")
+        db.session.remove()
+
+
+def format_metrics() -> str:
+    """
+    The function `format_metrics` renders the per process counters as a single log line.
+    """
+    done = METRICS["succeeded"] + METRICS["retried"] + METRICS["failed"]
+    avg = METRICS["busy_seconds"] / done if done else 0.0
+    return (
+        f"claimed={METRICS['claimed']:.0f} succeeded={METRICS['succeeded']:.0f} "
+        f"retried={METRICS['retried']:.0f} failed={METRICS['failed']:.0f} "
+        f"lost={METRICS['lost']:.0f} avg_runtime={avg:.3f}s"
+    )
+
+
+def queue_stats() -> dict:
+    """
+    The function `queue_stats` returns job counts by task and status plus the age of the oldest
+    runnable job, which is the queue lag.
+    """
+    rows = db.session.execute(
+        select(Job.task, Job.status, func.count()).group_by(Job.task, Job.status)
+    ).all()
+    counts: dict[str, dict[str, int]] = {}
+    for task_name, status, count in rows:
+        counts.setdefault(task_name, {})[status] = count
+    oldest = db.session.scalar(
+        select(func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= datetime.now())
+    )
+    lag = (datetime.now() - oldest).total_seconds() if oldest else 0.0
+    return {"counts": counts, "lag_seconds": lag}
@@ -0,0 +1,159 @@
+"""
+Background tasks
+- Fetch profile picture from url
+- Process uploaded profile picture
+- Purge soft deleted users
+- Collect unreferenced profile pictures
+- Re-render stale post HTML
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from flask_wtf.file import FileStorage
+from PIL import UnidentifiedImageError
+from sqlalchemy import bindparam, delete, exists, select, update
+from project import app, db
+from project.jobs.queue import enqueue, task
+from project.models import BlogPost, User
+from project.posts.rendering import RENDERER_VERSION, render
+from project.posts.indexing import author_removed, posts_removed
+from project.users.picture_handler import add_profile_pic, collect_garbage, picture_from_url
+
+
+def spool_path(filename: str) -> str:
+    """
+    The function `spool_path` returns where an upload waiting for a worker is stored, creating the
+    spool directory when needed.
+    """
+    spool_dir = os.path.join(app.instance_path, "uploads")
+    os.makedirs(spool_dir, exist_ok=True)
+    return os.path.join(spool_dir, filename)
+
+
+@task("fetch_profile_picture")
+def fetch_profile_picture(user_id: int, url: str):
+    """
+    The task `fetch_profile_picture` downloads the picture at `url` and sets it as the user's profile
+    image.
+    """
+    user = db.session.get(User, user_id)
+    if user is None:
+        return
+    user.profile_img = picture_from_url(url)
+
+
+def remove_spooled_picture(user_id: int, path: str, filename: str):
+    """
+    The function `remove_spooled_picture` removes the spool file of a `process_profile_picture` job
+    that failed for good.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@task("process_profile_picture", on_failure=remove_spooled_picture)
+def process_profile_picture(user_id: int, path: str, filename: str):
+    """
+    The task `process_profile_picture` resizes a spooled upload, stores it as the user's profile image
+    and removes the spool file. An upload that is not an image is dropped at once, since retrying it
+    cannot help.
+    """
+    if not os.path.exists(path):
+        return
+    user = db.session.get(User, user_id)
+    if user is not None:
+        try:
+            with open(path, "rb") as f:
+                user.profile_img = add_profile_pic(FileStorage(f, filename=filename))
+        except UnidentifiedImageError:
+            app.logger.warning(f"Upload {filename!r} of user #{user_id} is not an image, dropped")
+    os.remove(path)
+
+
+PURGE_BATCH_SIZE = 500
+
+
+@task("purge_user")
+def purge_user(user_id: int, batch_size: int = PURGE_BATCH_SIZE):
+    """
+    The task `purge_user` deletes the posts of a soft deleted user `batch_size` at a time, one short
+    transaction per batch, so other writers are not locked out of the database. Each run enqueues the
+    next batch; once no posts are left the user row is removed. Its picture may be shared with other
+    users, so it is left to `collect_images`.
+    """
+    post_ids = db.session.scalars(
+        select(BlogPost.id)
+        .where(BlogPost.user_id == user_id)
+        .limit(batch_size)
+        .execution_options(include_deleted=True)
+    ).all()
+    if post_ids:
+        posts_removed(post_ids, hidden=True)
+        db.session.execute(
+            delete(BlogPost).where(BlogPost.id.in_(post_ids)),
+            execution_options={"synchronize_session": False},
+        )
+        enqueue("purge_user", user_id=user_id, batch_size=batch_size)
+        return
+    user = db.session.get(User, user_id, execution_options={"include_deleted": True})
+    if user is None or user.deleted_at is None:
+        return
+    author_removed(user_id)
+    db.session.delete(user)
+
+
+@task("collect_images")
+def collect_images(grace_seconds: float = 3600):
+    """
+    The task `collect_images` deletes the profile pictures no user row (soft deleted ones included)
+    references, once they are older than `grace_seconds`.
+    """
+    users = User.__table__
+    referenced = set(db.session.scalars(select(users.c.profile_img).distinct()))
+
+    def is_referenced(filename: str) -> bool:
+        return db.session.scalar(select(exists().where(users.c.profile_img == filename)))
+
+    deleted, reclaimed = collect_garbage(referenced, grace_seconds, is_referenced)
+    app.logger.info(f"Deleted {deleted} unreferenced pictures, {reclaimed} bytes reclaimed")
+
+
+RERENDER_BATCH_SIZE = 500
+
+
+@task("rerender_posts")
+def rerender_posts(
+    after_id: int = 0, batch_size: int = RERENDER_BATCH_SIZE, processes: int | None = None
+):
+    """
+    The task `rerender_posts` renders again the posts whose HTML was produced by an older renderer
+    version, `batch_size` posts with an id above `after_id` per run, so a run stays well within its
+    lease. The batch is rendered in parallel by a pool of `processes` processes and written back with
+    one executemany UPDATE. Each run enqueues the next batch in the same transaction, until no stale
+    post is left.
+
+    A post edited while its batch is being rendered already has the current version, so the UPDATE
+    skips it instead of overwriting its new HTML.
+    """
+    posts = BlogPost.__table__
+    rows = db.session.execute(
+        select(posts.c.id, posts.c.text)
+        .where(posts.c.renderer_version < RENDERER_VERSION, posts.c.id > after_id)
+        .order_by(posts.c.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        app.logger.info(f"Every post is rendered by renderer version {RENDERER_VERSION}")
+        return
+    # Spawned, not forked: the worker has a heartbeat thread and database connections running.
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        htmls = list(pool.map(render, [row.text for row in rows], chunksize=16))
+    db.session.execute(
+        update(posts)
+        .where(posts.c.id == bindparam("post_id"), posts.c.renderer_version < RENDERER_VERSION)
+        .values(text_html=bindparam("html"), renderer_version=RENDERER_VERSION),
+        [{"post_id": row.id, "html": html} for row, html in zip(rows, htmls)],
+    )
+    enqueue("rerender_posts", after_id=rows[-1].id, batch_size=batch_size, processes=processes)
+    app.logger.info(f"Re-rendered posts #{rows[0].id} to #{rows[-1].id} ({len(rows)} posts)")
@@ -0,0 +1,176 @@
+"""
+CLI for database maintenance
+- flask blog reindex
+- flask blog recompute
+- flask blog vacuum
+- flask blog verify-avatars
+- flask blog export / flask blog import
+"""
+
+import os
+import click
+import sqlalchemy as sa
+from flask.cli import AppGroup
+from project import db
+from project.maintenance.dump import export_db, import_db
+from project.maintenance.progress import Progress
+from project.models import BlogPost, User
+from project.posts.indexing import rebuild_author_stats, rebuild_indexes
+from project.posts.rendering import RENDERER_VERSION, count_words, render
+from project.users.picture_handler import DEFAULT_PICTURE, pictures_dir
+
+blog_cli = AppGroup("blog", help="Batch maintenance of the blog database.")
+
+
+def _database_path() -> str:
+    return db.engine.url.database  # type: ignore
+
+
+def _autocommit(statement: str):
+    # VACUUM and friends cannot run inside a transaction.
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(statement)
+
+
+@blog_cli.command("reindex")
+@click.option("--sql", is_flag=True, help="Also rebuild the SQLite indexes (REINDEX).")
+def reindex_command(sql: bool):
+    """Rebuild the tag counts, month counts, post_tags dates and author stats from the posts."""
+    progress = Progress("reindex")
+    changed = rebuild_indexes()
+    changed["author_stats"] = rebuild_author_stats()
+    db.session.commit()
+    for table, rows in changed.items():
+        click.echo(f"{table}: {rows} rows rewritten")
+        progress.advance(rows)
+    if sql:
+        _autocommit("REINDEX")
+        click.echo("SQLite indexes rebuilt.")
+    progress.finish()
+
+
+@blog_cli.command("recompute")
+@click.option("--stale", is_flag=True, help="Only posts rendered by an older renderer version.")
+@click.option("--batch-size", default=500, show_default=True, help="Posts per transaction.")
+def recompute_command(stale: bool, batch_size: int):
+    """Render the HTML and count the words of the posts again, one transaction per batch.
+
+    The author word counts are recomputed at the end if any post word count changed.
+    """
+    posts = BlogPost.__table__
+    select_batch = (
+        sa.select(posts.c.id, posts.c.text, posts.c.word_count)
+        .where(posts.c.id > sa.bindparam("last_id"))
+        .order_by(posts.c.id)
+        .limit(batch_size)
+    )
+    count = sa.select(sa.func.count()).select_from(posts)
+    if stale:
+        select_batch = select_batch.where(posts.c.renderer_version < RENDERER_VERSION)
+        count = count.where(posts.c.renderer_version < RENDERER_VERSION)
+    store = (
+        sa.update(posts)
+        .where(posts.c.id == sa.bindparam("post_id"))
+        .values(
+            text_html=sa.bindparam("html"),
+            renderer_version=RENDERER_VERSION,
+            word_count=sa.bindparam("words"),
+        )
+    )
+    progress = Progress("recompute html", db.session.scalar(count))
+    last_id, recounted = 0, 0
+    # Keyset batches rather than one streamed cursor: committing would close a cursor still open.
+    while rows := db.session.execute(select_batch, {"last_id": last_id}).all():
+        params = [
+            {"post_id": row.id, "html": render(row.text), "words": count_words(row.text)} for row in rows
+        ]
+        recounted += sum(row.word_count != param["words"] for row, param in zip(rows, params))
+        db.session.execute(store, params)
+        db.session.commit()
+        last_id = rows[-1].id
+        progress.advance(len(rows))
+    progress.finish()
+    if recounted:
+        rebuild_author_stats()
+        db.session.commit()
+        click.echo(f"{recounted} word counts changed, author stats rebuilt.")
+
+
+@blog_cli.command("vacuum")
+@click.option("--analyze-only", is_flag=True, help="Only refresh the query planner statistics.")
+def vacuum_command(analyze_only: bool):
+    """Refresh the planner statistics and compact the SQLite file."""
+    path = _database_path()
+    before = os.path.getsize(path)
+    _autocommit("ANALYZE")
+    click.echo("Statistics refreshed.")
+    if analyze_only:
+        return
+    progress = Progress("vacuum")
+    _autocommit("VACUUM")
+    after = os.path.getsize(path)
+    click.echo(f"{path}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB in {progress.elapsed:.2f}s")
+
+
+@blog_cli.command("verify-avatars")
+@click.option("--fix", is_flag=True, help="Reset missing pictures to the default one.")
+@click.option("--batch-size", default=1000, show_default=True)
+def verify_avatars_command(fix: bool, batch_size: int):
+    """Check that the picture of every user exists on disk."""
+    users = User.__table__
+    directory = pictures_dir()
+    files = set(os.listdir(directory))
+    progress = Progress("verify avatars", db.session.scalar(sa.select(sa.func.count()).select_from(users)))
+    missing: list[int] = []
+    referenced: set[str] = set()
+    result = db.session.execute(
+        sa.select(users.c.id, users.c.username, users.c.profile_img)
+        .order_by(users.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        for user_id, username, profile_img in partition:
+            referenced.add(profile_img)
+            if profile_img not in files:
+                missing.append(user_id)
+                click.echo(f"missing: {username} -> {profile_img}")
+        progress.advance(len(partition))
+    progress.finish()
+    unreferenced = files - referenced - {DEFAULT_PICTURE}
+    click.echo(f"{len(missing)} users with a missing picture, {len(unreferenced)} unreferenced files.")
+    if fix and missing:
+        for i in range(0, len(missing), batch_size):
+            db.session.execute(
+                sa.update(users)
+                .where(users.c.id.in_(missing[i : i + batch_size]))
+                .values(profile_img=DEFAULT_PICTURE)
+            )
+            db.session.commit()
+        click.echo(f"Reset {len(missing)} pictures to {DEFAULT_PICTURE}.")
+
+
+@blog_cli.command("export")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("-t", "--table", "tables", multiple=True, help="Only this table (repeatable).")
+@click.option("--batch-size", default=1000, show_default=True)
+def export_command(path: str, tables: tuple[str, ...], batch_size: int):
+    """Export the database to PATH as gzipped NDJSON."""
+    try:
+        total = export_db(path, tables, batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Exported {total} rows to {path}.")
+
+
+@blog_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--replace", is_flag=True, help="Empty the tables found in PATH first.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per transaction.")
+def import_command(path: str, replace: bool, batch_size: int):
+    """Import a gzipped NDJSON export, committing every --batch-size rows."""
+    try:
+        total = import_db(path, replace, batch_size)
+    except (ValueError, sa.exc.IntegrityError) as e:
+        db.session.rollback()
+        raise click.ClickException(str(e).splitlines()[0])
+    click.echo(f"Imported {total} rows from {path}.")
@@ -0,0 +1,130 @@
+"""
+Export and import of the database as gzipped NDJSON
+- One header line, then one {"table": ..., "row": {...}} line per row, tables in foreign key order
+- Rows are streamed with `yield_per` on export and inserted in chunks with one commit per chunk on
+  import, so memory use does not grow with the database
+"""
+
+import gzip
+import json
+from datetime import datetime
+from typing import Iterable
+import sqlalchemy as sa
+from project import db
+from project.maintenance.progress import Progress
+
+FORMAT = "puppyblog-ndjson"
+FORMAT_VERSION = 1
+# Not exported: the commits of an import bump the cache versions by themselves.
+SKIPPED_TABLES = {"cache_versions"}
+
+
+def _tables(names: Iterable[str] | None = None) -> list[sa.Table]:
+    tables = [table for table in db.metadata.sorted_tables if table.name not in SKIPPED_TABLES]
+    if names:
+        unknown = set(names) - {table.name for table in tables}
+        if unknown:
+            raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        tables = [table for table in tables if table.name in names]
+    return tables
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decoders(table: sa.Table) -> dict:
+    return {
+        column.name: datetime.fromisoformat
+        for column in table.columns
+        if isinstance(column.type, sa.DateTime)
+    }
+
+
+def export_db(path: str, tables: Iterable[str] | None = None, batch_size: int = 1000) -> int:
+    """
+    The function `export_db` writes the rows of `tables` (every table by default) to the gzipped NDJSON
+    file `path`.
+
+    :return: the number of rows written.
+    """
+    total = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"format": FORMAT, "version": FORMAT_VERSION}) + "\n")
+        for table in _tables(tables):
+            count = db.session.scalar(sa.select(sa.func.count()).select_from(table))
+            progress = Progress(f"export {table.name}", count)
+            stmt = sa.select(table).order_by(*table.primary_key.columns)
+            result = db.session.execute(
+                stmt.execution_options(yield_per=batch_size, include_deleted=True)
+            )
+            for partition in result.mappings().partitions():
+                for row in partition:
+                    line = {"table": table.name, "row": {k: _encode(v) for k, v in row.items()}}
+                    f.write(json.dumps(line, separators=(",", ":")) + "\n")
+                progress.advance(len(partition))
+            progress.finish()
+            total += progress.done
+    return total
+
+
+def import_db(path: str, replace: bool = False, batch_size: int = 1000) -> int:
+    """
+    The function `import_db` inserts the rows of the gzipped NDJSON file `path`, committing every
+    `batch_size` rows. With `replace` the tables found in the file are emptied first, otherwise the
+    rows must not exist yet.
+
+    :return: the number of rows inserted.
+    """
+    tables = {table.name: table for table in _tables()}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != FORMAT or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a {FORMAT} v{FORMAT_VERSION} file")
+        if replace:
+            names = _table_names(path)
+            for table in reversed(_tables()):
+                if table.name in names:
+                    db.session.execute(table.delete())
+            db.session.commit()
+
+        total, table, progress, decoders, chunk = 0, None, None, {}, []
+
+        def flush():
+            if chunk:
+                db.session.execute(table.insert(), chunk)  # type: ignore
+                db.session.commit()
+                progress.advance(len(chunk))  # type: ignore
+                chunk.clear()
+
+        for line in f:
+            record = json.loads(line)
+            if table is None or record["table"] != table.name:
+                flush()
+                if progress:
+                    progress.finish()
+                    total += progress.done
+                table = tables[record["table"]]
+                decoders = _decoders(table)
+                progress = Progress(f"import {table.name}")
+            row = record["row"]
+            for name, decode in decoders.items():
+                if row.get(name) is not None:
+                    row[name] = decode(row[name])
+            chunk.append(row)
+            if len(chunk) >= batch_size:
+                flush()
+        flush()
+        if progress:
+            progress.finish()
+            total += progress.done
+    return total
+
+
+def _table_names(path: str) -> set[str]:
+    # A first pass over the file, so `replace` only empties the tables the file brings back.
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        next(f)
+        return {json.loads(line)["table"] for line in f}
@@ -0,0 +1,52 @@
+"""
+Progress reporting for the batch commands
+- Rows done, percentage and throughput, printed at most once per interval
+- A summary with the total time and the average throughput
+"""
+
+import time
+import click
+
+
+# The `Progress` class counts the rows processed by a batch command and prints how far it got to
+# stderr, so the output of a command can still be piped.
+class Progress:
+    def __init__(self, label: str, total: int | None = None, interval: float = 1.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def rate(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def _line(self) -> str:
+        done = f"{self.done}/{self.total}" if self.total else str(self.done)
+        percent = f" ({self.done / self.total:.0%})" if self.total else ""
+        return f"{self.label}: {done} rows{percent}, {self.rate:,.0f} rows/s"
+
+    def advance(self, rows: int = 1):
+        """
+        The function adds `rows` to the rows done and reports them if `interval` seconds passed since the
+        last report.
+        """
+        self.done += rows
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            click.echo(self._line(), err=True)
+
+    def finish(self):
+        """
+        The function prints the total rows done, the time taken and the average throughput.
+        """
+        click.echo(
+            f"{self.label}: {self.done} rows in {self.elapsed:.2f}s ({self.rate:,.0f} rows/s)", err=True
+        )
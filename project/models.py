@@ -1,13 +1,20 @@
-from sqlalchemy import String, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+import json
+from sqlalchemy import String, ForeignKey, Text, Index, event, select, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship, with_loader_criteria
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from project import login_manager, db, app
+from project.routing import RoutingSession
+
+# Evaluated by SQLite for every inserted row, in local time like the existing rows, with the same
+# microsecond layout SQLAlchemy writes so rows keep sorting correctly as text.
+CURRENT_TIMESTAMP = text("(strftime('%Y-%m-%d %H:%M:%f000', 'now', 'localtime'))")
+
 
 class TimedBase(db.Model):
     __abstract__ = True
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now())
+    created_at: Mapped[datetime] = mapped_column(server_default=CURRENT_TIMESTAMP)
 
 
 @login_manager.user_loader
@@ -19,8 +26,10 @@ def load_user(user_id: int):
     the database
     :return: the user object with the specified user_id.
     """
+    from project.repository import get_user
+
     with app.app_context():
-        user: User | None = User.query.filter_by(id=user_id).first()
+        user: User | None = get_user(int(user_id))
     return user
 
 
@@ -38,6 +47,8 @@ class User(TimedBase, UserMixin):
     )
     username: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     password_hash: Mapped[str] = mapped_column(String(128))
+    # Set when the user is deleted. The row and the posts are purged later by a background job.
+    deleted_at: Mapped[datetime | None] = mapped_column(index=True)
     posts: Mapped[list["BlogPost"]] = relationship(back_populates="author", passive_deletes=True)
 
     def __init__(self, email, username, password):
@@ -73,12 +84,27 @@ class User(TimedBase, UserMixin):
 
 class BlogPost(TimedBase):
     __tablename__ = "blogposts"
+    # Feed, archive and keyset pagination scan posts by date (SQLite appends the id to every index),
+    # author pages scan the posts of one user by date.
+    __table_args__ = (
+        Index("ix_blogposts_created_at", "created_at"),
+        Index("ix_blogposts_user_id_created_at", "user_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     title: Mapped[str] = mapped_column(String(128),nullable=False)
     text: Mapped[str] = mapped_column(nullable=False)
+    # `text` (Markdown) rendered to sanitized HTML at write time, see `project.posts.rendering`.
+    text_html: Mapped[str | None] = mapped_column(Text)
+    renderer_version: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0", index=True)
+    # Counted at write time with the HTML, summed by `AuthorStats`.
+    word_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     author: Mapped["User"] = relationship(back_populates="posts")
+    # Written through `project.posts.indexing` only, which keeps the tag counts up to date.
+    tags: Mapped[list["Tag"]] = relationship(
+        secondary="post_tags", order_by="Tag.name", viewonly=True
+    )
     
     def __init__(self, user_id, title, text):
         self.user_id = user_id
@@ -98,5 +124,191 @@ class BlogPost(TimedBase):
             "author_id": self.user_id,
             "title": self.title,
             "text": self.text.strip(),
+            "text_html": self.text_html,
+            "tags": [tag.name for tag in self.tags],
+        }
+
+
+# The `Tag` class represents a topic posts can be filed under. `post_count` is maintained incrementally
+# by `project.posts.indexing` so listing tags never needs a GROUP BY over the posts.
+class Tag(db.Model):
+    __tablename__ = "tags"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
+    post_count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: {self.name} | posts: {self.post_count}"
+
+
+# The `PostTag` class links posts and tags. It keeps a copy of the post's `created_at` so the posts of a
+# tag can be paginated newest first from the (tag_id, created_at, post_id) index alone.
+class PostTag(db.Model):
+    __tablename__ = "post_tags"
+    __table_args__ = (Index("ix_post_tags_tag_created", "tag_id", "created_at", "post_id"),)
+
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("blogposts.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+
+
+# The `ArchiveMonth` class holds how many posts were written each month, maintained incrementally by
+# `project.posts.indexing`.
+class ArchiveMonth(db.Model):
+    __tablename__ = "archive_months"
+
+    year: Mapped[int] = mapped_column(primary_key=True)
+    month: Mapped[int] = mapped_column(primary_key=True)
+    post_count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: {self.year}-{self.month:02} | posts: {self.post_count}"
+
+
+# The `AuthorStats` class holds the aggregates of the posts of each author. It is maintained
+# incrementally by `project.posts.indexing`, so profile pages never scan the posts of the author.
+class AuthorStats(db.Model):
+    __tablename__ = "author_stats"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    post_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    word_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    first_post_at: Mapped[datetime | None]
+    last_post_at: Mapped[datetime | None]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: user {self.user_id} | posts: {self.post_count}"
+
+    def json(self):
+        """
+        The function is used to convert AuthorStats data to JSON format.
+        """
+        return {
+            "posts": self.post_count,
+            "words": self.word_count,
+            "words_per_post": round(self.word_count / self.post_count) if self.post_count else 0,
+            "first_post_at": self.first_post_at,
+            "last_post_at": self.last_post_at,
+        }
+
+
+# The `AuthorMonth` class holds how many posts each author wrote each month, maintained incrementally
+# by `project.posts.indexing` like `ArchiveMonth`.
+class AuthorMonth(db.Model):
+    __tablename__ = "author_months"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    year: Mapped[int] = mapped_column(primary_key=True)
+    month: Mapped[int] = mapped_column(primary_key=True)
+    post_count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        month = f"{self.year}-{self.month:02}"
+        return f"{self.__class__.__name__}: user {self.user_id} | {month} | posts: {self.post_count}"
+
+
+# The `PostViews` class stores how many times each post was viewed. Rows are only written in batches by
+# `project.posts.counters.ViewCounter`, never on the request path.
+class PostViews(db.Model):
+    __tablename__ = "post_views"
+
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("blogposts.id", ondelete="CASCADE"), primary_key=True
+    )
+    views: Mapped[int] = mapped_column(nullable=False, default=0, index=True)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: post {self.post_id} | views: {self.views}"
+
+
+# The `CacheVersion` class holds counters that are bumped every time the data behind a cached document
+# changes. They are used as the ETag of the sitemaps and feeds, see `project.feeds.cache`.
+class CacheVersion(db.Model):
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: {self.name} | version: {self.version}"
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _hide_deleted(orm_execute_state):
+    """
+    The function `_hide_deleted` filters soft deleted users, and the posts of soft deleted users, out of
+    every ORM select. Pass the execution option `include_deleted=True` to see them.
+    """
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        users = User.__table__
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(User, User.deleted_at.is_(None), include_aliases=True),
+            with_loader_criteria(
+                BlogPost,
+                BlogPost.user_id.not_in(select(users.c.id).where(users.c.deleted_at.is_not(None))),
+                include_aliases=True,
+            ),
+        )
+
+
+# The `Job` class represents a unit of deferred work stored in the database so it survives restarts and
+# can be leased by any worker process.
+class Job(TimedBase):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    # queued -> running -> done | failed (a failed attempt goes back to queued until max_attempts)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(nullable=False, default=5)
+    run_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.now)
+    locked_by: Mapped[str | None] = mapped_column(String(64))
+    locked_until: Mapped[datetime | None]
+    finished_at: Mapped[datetime | None]
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    def __init__(self, task, args, run_at, max_attempts=5):
+        self.task = task
+        self.payload = json.dumps(args)
+        self.run_at = run_at
+        self.max_attempts = max_attempts
+        self.status = "queued"
+        self.attempts = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}: {self.task} #{self.id} | status: {self.status}"
+
+    @property
+    def args(self) -> dict:
+        """
+        The function is used to decode the keyword arguments the task will be called with.
+        """
+        return json.loads(self.payload)
+
+    def json(self):
+        """
+        The function is used to convert Job data to JSON format.
+        """
+        return {
+            "job_id": self.id,
+            "task": self.task,
+            "status": self.status,
+            "attempts": self.attempts,
+            "run_at": self.run_at,
+            "last_error": self.last_error,
         }
-    
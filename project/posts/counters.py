@@ -0,0 +1,93 @@
+"""
+Write-behind view counters
+- Count views in memory on the request path
+- Flush them periodically with a single batched UPSERT
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from project import app, db
+from project.models import BlogPost, PostViews
+
+
+# The `ViewCounter` class accumulates post views in memory and adds them to the `post_views` table
+# in the background every `flush_interval` seconds, so reading a post never waits for SQLite's
+# writer lock.
+# Every worker process has its own counter; their flushes add up in the database.
+class ViewCounter:
+    chunk_size = 400
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._pending: Counter[int] = Counter()
+        self._lock = threading.Lock()
+        self._flusher_pid: int | None = None
+
+    def record(self, post_id: int):
+        """
+        The function records one view of `post_id`. It only touches memory.
+        """
+        with self._lock:
+            self._pending[post_id] += 1
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self._lock:
+            # Threads do not survive a fork, so each worker process starts its own flusher.
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run, name="view-counter-flusher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("Could not flush view counts")
+
+    def flush(self) -> int:
+        """
+        The function writes the pending views with batched `INSERT ... ON CONFLICT DO UPDATE`
+        statements in a single transaction and returns the number of posts updated. If the write
+        fails the views are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        rows = [{"post_id": post_id, "views": views} for post_id, views in pending.items()]
+        try:
+            with app.app_context():
+                # Chunked to stay under SQLite's limit of bound parameters per statement.
+                for start in range(0, len(rows), self.chunk_size):
+                    chunk = rows[start : start + self.chunk_size]
+                    # Views of posts deleted since they were read are dropped.
+                    post_ids = [row["post_id"] for row in chunk]
+                    existing = set(db.session.scalars(select(BlogPost.id).where(BlogPost.id.in_(post_ids))))
+                    chunk = [row for row in chunk if row["post_id"] in existing]
+                    if not chunk:
+                        continue
+                    stmt = insert(PostViews).values(chunk)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[PostViews.post_id],
+                        set_={"views": PostViews.views + stmt.excluded.views},
+                    )
+                    db.session.execute(stmt)
+                db.session.commit()
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return len(rows)
+
+
+view_counter = ViewCounter(app.config["VIEW_COUNTS_FLUSH_SECONDS"])
+atexit.register(view_counter.flush)
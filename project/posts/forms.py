@@ -6,4 +6,5 @@ from wtforms.validators import DataRequired
 class BlogPostForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired()])
     text = TextAreaField('Text', validators=[DataRequired()])
+    tags = StringField('Tags')
     submit = SubmitField('Post')
\ No newline at end of file
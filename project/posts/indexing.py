@@ -0,0 +1,381 @@
+"""
+Tag and archive indexes
+- Parse tags
+- Keep post_tags, tag counts, month counts and author stats in step with post writes
+- Rebuild the counts from scratch
+- Keyset pagination over the tag and archive indexes
+"""
+
+from datetime import datetime
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+from project import db
+from project.models import ArchiveMonth, AuthorMonth, AuthorStats, BlogPost, PostTag, PostViews, Tag, User
+
+MAX_TAGS = 10
+
+
+def parse_tags(raw: str | list[str] | None) -> list[str]:
+    """
+    The function `parse_tags` turns a comma separated string (or a list) of tags into a list of unique,
+    lower case tag names, keeping at most `MAX_TAGS`.
+    """
+    if not raw:
+        return []
+    names = raw.split(",") if isinstance(raw, str) else raw
+    tags: list[str] = []
+    for name in names:
+        name = " ".join(str(name).split()).lower()[:64]
+        if name and name not in tags:
+            tags.append(name)
+    return tags[:MAX_TAGS]
+
+
+def _add_to_month(created_at: datetime, delta: int):
+    stmt = insert(ArchiveMonth).values(
+        year=created_at.year, month=created_at.month, post_count=delta
+    )
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ArchiveMonth.year, ArchiveMonth.month],
+            set_={"post_count": ArchiveMonth.post_count + stmt.excluded.post_count},
+        )
+    )
+
+
+def _add_to_author(post: BlogPost):
+    stmt = insert(AuthorStats).values(
+        user_id=post.user_id,
+        post_count=1,
+        word_count=post.word_count,
+        first_post_at=post.created_at,
+        last_post_at=post.created_at,
+    )
+    excluded = stmt.excluded
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[AuthorStats.user_id],
+            set_={
+                "post_count": AuthorStats.post_count + 1,
+                "word_count": AuthorStats.word_count + excluded.word_count,
+                # SQLite's min/max of several arguments are NULL if any is, hence the coalesce.
+                "first_post_at": func.min(
+                    func.coalesce(AuthorStats.first_post_at, excluded.first_post_at),
+                    excluded.first_post_at,
+                ),
+                "last_post_at": func.max(
+                    func.coalesce(AuthorStats.last_post_at, excluded.last_post_at),
+                    excluded.last_post_at,
+                ),
+            },
+        )
+    )
+    stmt = insert(AuthorMonth).values(
+        user_id=post.user_id, year=post.created_at.year, month=post.created_at.month, post_count=1
+    )
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[AuthorMonth.user_id, AuthorMonth.year, AuthorMonth.month],
+            set_={"post_count": AuthorMonth.post_count + 1},
+        )
+    )
+
+
+def _remove_from_authors(post_ids: list[int]):
+    posts = BlogPost.__table__
+    totals = db.session.execute(
+        select(posts.c.user_id, func.count(), func.sum(posts.c.word_count))
+        .where(posts.c.id.in_(post_ids))
+        .group_by(posts.c.user_id)
+    ).all()
+    if not totals:
+        return
+    for user_id, count, words in totals:
+        db.session.execute(
+            update(AuthorStats)
+            .where(AuthorStats.user_id == user_id)
+            .values(
+                post_count=AuthorStats.post_count - count,
+                word_count=AuthorStats.word_count - words,
+            )
+        )
+    year_month = func.strftime("%Y-%m", posts.c.created_at)
+    for user_id, ym, count in db.session.execute(
+        select(posts.c.user_id, year_month, func.count())
+        .where(posts.c.id.in_(post_ids))
+        .group_by(posts.c.user_id, year_month)
+    ):
+        year, month = map(int, ym.split("-"))
+        db.session.execute(
+            update(AuthorMonth)
+            .where(AuthorMonth.user_id == user_id, AuthorMonth.year == year, AuthorMonth.month == month)
+            .values(post_count=AuthorMonth.post_count - count)
+        )
+    user_ids = [user_id for user_id, _, _ in totals]
+    db.session.execute(
+        delete(AuthorMonth).where(AuthorMonth.user_id.in_(user_ids), AuthorMonth.post_count <= 0)
+    )
+    # The first or last post may be among the removed ones: look the dates up again on the
+    # (user_id, created_at) index, leaving the removed posts out.
+    remaining = posts.c.user_id == AuthorStats.user_id, posts.c.id.not_in(post_ids)
+    db.session.execute(
+        update(AuthorStats)
+        .where(AuthorStats.user_id.in_(user_ids))
+        .values(
+            first_post_at=select(func.min(posts.c.created_at)).where(*remaining).scalar_subquery(),
+            last_post_at=select(func.max(posts.c.created_at)).where(*remaining).scalar_subquery(),
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    # Like `rebuild_author_stats`, an author without posts has no stats row.
+    db.session.execute(
+        delete(AuthorStats).where(AuthorStats.user_id.in_(user_ids), AuthorStats.post_count <= 0)
+    )
+
+
+def _tag_ids(names: list[str]) -> list[int]:
+    # Insert the missing tags; a concurrent insert of the same name is simply ignored.
+    db.session.execute(
+        insert(Tag).values([{"name": name, "post_count": 0} for name in names]).on_conflict_do_nothing()
+    )
+    return list(db.session.scalars(select(Tag.id).where(Tag.name.in_(names))))
+
+
+def set_post_tags(post: BlogPost, names: list[str]):
+    """
+    The function `set_post_tags` replaces the tags of a flushed post by `names`, adjusting the post count
+    of the tags added and removed.
+    """
+    current = set(db.session.scalars(select(PostTag.tag_id).where(PostTag.post_id == post.id)))
+    wanted = set(_tag_ids(names)) if names else set()
+    added, removed = wanted - current, current - wanted
+    if added:
+        db.session.execute(
+            insert(PostTag),
+            [{"post_id": post.id, "tag_id": tag_id, "created_at": post.created_at} for tag_id in added],
+        )
+        db.session.execute(
+            update(Tag).where(Tag.id.in_(added)).values(post_count=Tag.post_count + 1)
+        )
+    if removed:
+        db.session.execute(
+            delete(PostTag).where(PostTag.post_id == post.id, PostTag.tag_id.in_(removed))
+        )
+        db.session.execute(
+            update(Tag).where(Tag.id.in_(removed)).values(post_count=Tag.post_count - 1)
+        )
+    db.session.expire(post, ["tags"])
+
+
+def post_added(post: BlogPost, tags: list[str]):
+    """
+    The function `post_added` indexes a new post. Call it after the post is flushed, in the same
+    transaction.
+    """
+    _add_to_month(post.created_at, 1)
+    _add_to_author(post)
+    if tags:
+        set_post_tags(post, tags)
+
+
+def post_edited(post: BlogPost, previous_word_count: int):
+    """
+    The function `post_edited` updates the word count of the author of a post whose text was
+    rendered again, in the same transaction.
+    """
+    if post.word_count != previous_word_count:
+        db.session.execute(
+            update(AuthorStats)
+            .where(AuthorStats.user_id == post.user_id)
+            .values(word_count=AuthorStats.word_count + post.word_count - previous_word_count)
+        )
+
+
+def author_removed(user_id: int):
+    """
+    The function `author_removed` drops the stats of a purged user, once all their posts are removed.
+    """
+    db.session.execute(delete(AuthorStats).where(AuthorStats.user_id == user_id))
+    db.session.execute(delete(AuthorMonth).where(AuthorMonth.user_id == user_id))
+
+
+def _remove_from_counts(posts_filter):
+    # One grouped decrement per month and per tag of the posts matching `posts_filter`.
+    posts = BlogPost.__table__
+    month = func.strftime("%Y-%m", posts.c.created_at)
+    for year_month, count in db.session.execute(
+        select(month, func.count()).where(posts_filter).group_by(month)
+    ):
+        year, month_number = map(int, year_month.split("-"))
+        _add_to_month(datetime(year, month_number, 1), -count)
+    tag_counts = db.session.execute(
+        select(PostTag.tag_id, func.count())
+        .join(posts, posts.c.id == PostTag.post_id)
+        .where(posts_filter)
+        .group_by(PostTag.tag_id)
+    ).all()
+    for tag_id, count in tag_counts:
+        db.session.execute(
+            update(Tag).where(Tag.id == tag_id).values(post_count=Tag.post_count - count)
+        )
+
+
+def author_hidden(user_id: int):
+    """
+    The function `author_hidden` takes the posts of a user being soft deleted out of the tag and month
+    counts at once, in the same transaction, so the counts agree with the listings that already hide
+    them. The posts themselves are removed later by `posts_removed(..., hidden=True)`.
+    """
+    _remove_from_counts(BlogPost.__table__.c.user_id == user_id)
+
+
+def posts_removed(post_ids: list[int], hidden: bool = False):
+    """
+    The function `posts_removed` takes the posts `post_ids` out of the indexes, with one grouped
+    decrement per month, per tag and per author, and deletes their view counts. Call it right before
+    deleting the posts, in the same transaction: SQLite does not enforce the foreign keys, so nothing
+    cascades.
+
+    Pass `hidden=True` for the posts of an author already taken out of the counts by `author_hidden`:
+    only their tag links and view counts are deleted, the author stats go with `author_removed`.
+    """
+    if not post_ids:
+        return
+    if not hidden:
+        _remove_from_authors(post_ids)
+        _remove_from_counts(BlogPost.__table__.c.id.in_(post_ids))
+    db.session.execute(delete(PostTag).where(PostTag.post_id.in_(post_ids)))
+    db.session.execute(delete(PostViews).where(PostViews.post_id.in_(post_ids)))
+
+
+def rebuild_indexes() -> dict[str, int]:
+    """
+    The function `rebuild_indexes` recomputes the tag counts, the month counts and the post dates copied
+    to `post_tags` from the posts, with one grouped pass over each table. Use it to repair counts that
+    drifted, e.g. after editing the database by hand. Like `author_hidden`, the posts of soft deleted
+    users are left out of the counts.
+
+    :return: the number of rows written per table.
+    """
+    posts, users = BlogPost.__table__, User.__table__
+    visible = posts.c.user_id.not_in(select(users.c.id).where(users.c.deleted_at.is_not(None)))
+    synced = db.session.execute(
+        update(PostTag)
+        .where(
+            PostTag.created_at
+            != select(posts.c.created_at).where(posts.c.id == PostTag.post_id).scalar_subquery()
+        )
+        .values(
+            created_at=select(posts.c.created_at)
+            .where(posts.c.id == PostTag.post_id)
+            .scalar_subquery()
+        ),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    tag_counts = (
+        select(func.count())
+        .select_from(PostTag)
+        .join(posts, posts.c.id == PostTag.post_id)
+        .where(PostTag.tag_id == Tag.id, visible)
+        .correlate(Tag)
+        .scalar_subquery()
+    )
+    tags = db.session.execute(
+        update(Tag).where(Tag.post_count != tag_counts).values(post_count=tag_counts),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    year = func.cast(func.strftime("%Y", posts.c.created_at), db.Integer)
+    month = func.cast(func.strftime("%m", posts.c.created_at), db.Integer)
+    counts = db.session.execute(
+        select(year, month, func.count()).where(visible).group_by(year, month)
+    ).all()
+    db.session.execute(delete(ArchiveMonth))
+    if counts:
+        db.session.execute(
+            insert(ArchiveMonth),
+            [{"year": y, "month": m, "post_count": count} for y, m, count in counts],
+        )
+    return {"post_tags": synced, "tags": tags, "archive_months": len(counts)}
+
+
+def rebuild_author_stats() -> int:
+    """
+    The function `rebuild_author_stats` recomputes the stats and the posts per month of every author
+    with one grouped pass over the posts.
+
+    :return: the number of authors.
+    """
+    posts = BlogPost.__table__
+    db.session.execute(delete(AuthorStats))
+    db.session.execute(delete(AuthorMonth))
+    db.session.execute(
+        insert(AuthorStats).from_select(
+            ["user_id", "post_count", "word_count", "first_post_at", "last_post_at"],
+            select(
+                posts.c.user_id,
+                func.count(),
+                func.sum(posts.c.word_count),
+                func.min(posts.c.created_at),
+                func.max(posts.c.created_at),
+            ).group_by(posts.c.user_id),
+        )
+    )
+    year = func.cast(func.strftime("%Y", posts.c.created_at), db.Integer)
+    month = func.cast(func.strftime("%m", posts.c.created_at), db.Integer)
+    db.session.execute(
+        insert(AuthorMonth).from_select(
+            ["user_id", "year", "month", "post_count"],
+            select(posts.c.user_id, year, month, func.count()).group_by(posts.c.user_id, year, month),
+        )
+    )
+    return db.session.scalar(select(func.count()).select_from(AuthorStats)) or 0
+
+
+def parse_cursor(before: str | None, before_id: int | None) -> tuple[datetime, int] | None:
+    """
+    The function `parse_cursor` reads the keyset cursor of a listing page from the `before` (ISO date)
+    and `before_id` query arguments.
+
+    :return: the (created_at, id) of the last post of the previous page, or None for the first page.
+    Raises ValueError if the cursor is malformed.
+    """
+    if not before or before_id is None:
+        return None
+    return datetime.fromisoformat(before), before_id
+
+
+def tag_page(tag: Tag, cursor: tuple[datetime, int] | None, per_page: int = 5):
+    """
+    The function `tag_page` returns the posts of `tag` older than `cursor`, newest first, and whether
+    there are more. The scan runs on the (tag_id, created_at, post_id) index of `post_tags`.
+    """
+    stmt = (
+        select(BlogPost)
+        .join(PostTag, PostTag.post_id == BlogPost.id)
+        .where(PostTag.tag_id == tag.id)
+        .order_by(PostTag.created_at.desc(), PostTag.post_id.desc())
+        .limit(per_page + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(PostTag.created_at, PostTag.post_id) < tuple_(*cursor))
+    posts = list(db.session.scalars(stmt))
+    return posts[:per_page], len(posts) > per_page
+
+
+def month_page(year: int, month: int, cursor: tuple[datetime, int] | None, per_page: int = 5):
+    """
+    The function `month_page` returns the posts written in `year`/`month` older than `cursor`, newest
+    first, and whether there are more. The scan runs on the created_at index of `blogposts`.
+    """
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    stmt = (
+        select(BlogPost)
+        .where(BlogPost.created_at >= start, BlogPost.created_at < end)
+        .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+        .limit(per_page + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(BlogPost.created_at, BlogPost.id) < tuple_(*cursor))
+    posts = list(db.session.scalars(stmt))
+    return posts[:per_page], len(posts) > per_page
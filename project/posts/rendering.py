@@ -0,0 +1,62 @@
+"""
+Markdown rendering of post bodies
+- Render Markdown to sanitized HTML
+- Store it on the post with the version of the renderer that produced it
+- Count the words of the post
+"""
+
+import threading
+import bleach
+import markdown
+
+# Bump when the output of `render` changes (extensions, allowed tags, ...). Posts rendered by an
+# older version are re-rendered by the `rerender_posts` job.
+RENDERER_VERSION = 1
+
+ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS | {
+    "p", "br", "hr", "pre", "img", "del",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "table", "thead", "tbody", "tr", "th", "td",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title"],
+    "img": ["src", "alt", "title"],
+    "abbr": ["title"],
+    "acronym": ["title"],
+}
+
+# Building a `Markdown` instance loads all its extensions, so every thread keeps and reuses one.
+_local = threading.local()
+
+
+def _markdown() -> markdown.Markdown:
+    md = getattr(_local, "md", None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=["fenced_code", "tables", "sane_lists"])
+    return md
+
+
+def render(text: str) -> str:
+    """
+    The function `render` converts the Markdown `text` of a post to HTML and strips any tag or attribute
+    that is not explicitly allowed, so the result is safe to insert in the templates as is.
+    """
+    html = _markdown().reset().convert(text)
+    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+def render_post(post):
+    """
+    The function `render_post` stores the rendered HTML and the word count of `post.text` on the post.
+    It must be called every time the text is written.
+    """
+    post.text_html = render(post.text)
+    post.renderer_version = RENDERER_VERSION
+    post.word_count = count_words(post.text)
+
+
+def count_words(text: str) -> int:
+    """
+    The function `count_words` counts the whitespace separated words of the Markdown `text`.
+    """
+    return len(text.split())
@@ -4,13 +4,21 @@ For BlogPosts
 - View
 - Edit
 - Delete
+- Browse by tag
+- Browse by month
 """
 
 from flask import abort, flash, redirect, render_template, Blueprint, request, url_for
 from flask_login import current_user, login_required
 from project import db, app
-from project.models import BlogPost
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from project.models import ArchiveMonth, BlogPost, Tag
+from project.posts import indexing
 from project.posts.forms import BlogPostForm
+from project.posts.rendering import render_post
+from project.posts.counters import view_counter
+from project.routing import read_only
 
 blog_posts = Blueprint("blog_posts", __name__)
 
@@ -23,8 +31,11 @@ def create():
         blog_post = BlogPost(
             title=form.title.data, text=form.text.data, user_id=current_user.id # type: ignore
         )
+        render_post(blog_post)
         with app.app_context():
             db.session.add(blog_post)
+            db.session.flush()
+            indexing.post_added(blog_post, indexing.parse_tags(form.tags.data))
             db.session.commit()
         flash("Blog Post Created!", "success")
         return redirect(url_for("core.index"))
@@ -32,10 +43,15 @@ def create():
 
 
 @blog_posts.route("/posts/<int:blog_post_id>")
+@read_only
 def view(blog_post_id):
     with app.app_context():
-        blog_post = BlogPost.query.get_or_404(blog_post_id, "Post not found.")
+        # The template reads the tags after the context is gone: load them now.
+        blog_post = BlogPost.query.options(selectinload(BlogPost.tags)).get_or_404(
+            blog_post_id, "Post not found."
+        )
         author = blog_post.author
+    view_counter.record(blog_post_id)
     return render_template("view_post.html", post=blog_post, author=author)
 
 
@@ -52,12 +68,17 @@ def update(blog_post_id):
         if form.validate_on_submit():
             blog_post.title = form.title.data # type: ignore
             blog_post.text = form.text.data # type: ignore
+            previous_word_count = blog_post.word_count
+            render_post(blog_post)
+            indexing.post_edited(blog_post, previous_word_count)
+            indexing.set_post_tags(blog_post, indexing.parse_tags(form.tags.data))
             db.session.commit()
             flash("Blog post updated successfully.", "success")
             return redirect(url_for("blog_posts.view", blog_post_id=blog_post_id))
         elif request.method == "GET":
             form.title.data = blog_post.title
             form.text.data = blog_post.text
+            form.tags.data = ", ".join(tag.name for tag in blog_post.tags)
     return render_template("create_post.html", form=form)
 
 
@@ -70,7 +91,78 @@ def delete(blog_post_id):
         if author.id != current_user.id: # type: ignore
             flash("Only the author can delete the post.", "danger")
             abort(403)
+        indexing.posts_removed([blog_post.id])
         db.session.delete(blog_post)
         db.session.commit()
         flash("Post deleted successfully.", "success")
     return redirect(url_for("core.index"))
+
+
+@blog_posts.route("/tags")
+@read_only
+def tags():
+    with app.app_context():
+        tags = db.session.scalars(
+            select(Tag).where(Tag.post_count > 0).order_by(Tag.post_count.desc(), Tag.name)
+        ).all()
+        return render_template("tags.html", tags=tags)
+
+
+@blog_posts.route("/tag/<name>")
+@read_only
+def tag(name):
+    try:
+        cursor = indexing.parse_cursor(request.args.get("before"), request.args.get("before_id", type=int))
+    except ValueError:
+        abort(404)
+    with app.app_context():
+        tag = db.session.scalars(select(Tag).where(Tag.name == name)).first()
+        if tag is None:
+            abort(404)
+        posts, has_next = indexing.tag_page(tag, cursor)
+        return render_template(
+            "browse_posts.html",
+            heading=f"#{tag.name}",
+            subheading=f"{tag.post_count} posts",
+            posts=posts,
+            has_next=has_next,
+            endpoint="blog_posts.tag",
+            endpoint_args={"name": tag.name},
+        )
+
+
+@blog_posts.route("/archive")
+@read_only
+def archive():
+    with app.app_context():
+        months = db.session.scalars(
+            select(ArchiveMonth)
+            .where(ArchiveMonth.post_count > 0)
+            .order_by(ArchiveMonth.year.desc(), ArchiveMonth.month.desc())
+        ).all()
+        return render_template("archive.html", months=months)
+
+
+@blog_posts.route("/archive/<int:year>/<int:month>")
+@read_only
+def archive_month(year, month):
+    if not 1 <= month <= 12:
+        abort(404)
+    try:
+        cursor = indexing.parse_cursor(request.args.get("before"), request.args.get("before_id", type=int))
+    except ValueError:
+        abort(404)
+    with app.app_context():
+        count = db.session.scalar(
+            select(ArchiveMonth.post_count).where(ArchiveMonth.year == year, ArchiveMonth.month == month)
+        )
+        posts, has_next = indexing.month_page(year, month, cursor)
+        return render_template(
+            "browse_posts.html",
+            heading=f"{year}/{month:02}",
+            subheading=f"{count or 0} posts",
+            posts=posts,
+            has_next=has_next,
+            endpoint="blog_posts.archive_month",
+            endpoint_args={"year": year, "month": month},
+        )
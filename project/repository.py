@@ -0,0 +1,106 @@
+"""
+Hot path lookups
+- Users by id, username and email
+- Narrow rows for pages that only show a few columns
+- Email/username availability
+- Author stats
+
+The statements are built once, at import time, with bind parameters instead of literal values, so
+SQLAlchemy compiles each of them once and reuses the cached compiled form on every call.
+"""
+
+from sqlalchemy import Row, bindparam, func, select
+from project import db
+from project.models import AuthorMonth, AuthorStats, User
+
+_user_by_id = select(User).where(User.id == bindparam("user_id"))
+_user_by_username = select(User).where(User.username == bindparam("username"))
+_user_by_email = select(User).where(User.email == bindparam("email"))
+_user_id_by_username = select(User.id).where(User.username == bindparam("username"))
+# Both checks in one round trip. Each EXISTS is answered from the unique index alone.
+_taken = select(
+    select(User.id).where(User.email == bindparam("email")).exists().label("email"),
+    select(User.id).where(User.username == bindparam("username")).exists().label("username"),
+)
+_user_summary_by_username = (
+    select(
+        User.id,
+        User.username,
+        User.email,
+        User.profile_img,
+        User.created_at,
+        func.coalesce(AuthorStats.post_count, 0).label("posts"),
+    )
+    .outerjoin(AuthorStats, AuthorStats.user_id == User.id)
+    .where(User.username == bindparam("username"))
+)
+_author_stats = select(AuthorStats).where(AuthorStats.user_id == bindparam("user_id"))
+_author_months = (
+    select(AuthorMonth.year, AuthorMonth.month, AuthorMonth.post_count)
+    .where(AuthorMonth.user_id == bindparam("user_id"))
+    .order_by(AuthorMonth.year.desc(), AuthorMonth.month.desc())
+    .limit(bindparam("months"))
+)
+
+# Deleted users keep their email and username until they are purged.
+_with_deleted = {"include_deleted": True}
+
+
+def get_user(user_id: int) -> User | None:
+    """
+    The function `get_user` returns the user with the given id.
+    """
+    return db.session.scalars(_user_by_id, {"user_id": user_id}).first()
+
+
+def get_user_by_username(username: str) -> User | None:
+    """
+    The function `get_user_by_username` returns the user with the given username.
+    """
+    return db.session.scalars(_user_by_username, {"username": username}).first()
+
+
+def get_user_by_email(email: str) -> User | None:
+    """
+    The function `get_user_by_email` returns the user with the given email.
+    """
+    return db.session.scalars(_user_by_email, {"email": email}).first()
+
+
+def get_user_id(username: str) -> int | None:
+    """
+    The function `get_user_id` returns only the id of the user with the given username.
+    """
+    return db.session.scalar(_user_id_by_username, {"username": username})
+
+
+def get_user_summary(username: str) -> Row | None:
+    """
+    The function `get_user_summary` returns a narrow row (id, username, email, profile_img, created_at,
+    posts) for the user with the given username, reading the post count from `author_stats` instead of
+    counting the posts.
+    """
+    return db.session.execute(_user_summary_by_username, {"username": username}).first()
+
+
+def get_author_stats(user_id: int, months: int = 12) -> tuple[AuthorStats, list[Row]]:
+    """
+    The function `get_author_stats` returns the stats of the author `user_id` (all zero if they never
+    posted) and their posts per month, newest first, for the last `months` months they posted in.
+    """
+    stats = db.session.scalars(_author_stats, {"user_id": user_id}).first()
+    if stats is None:
+        stats = AuthorStats(user_id=user_id, post_count=0, word_count=0)
+    return stats, db.session.execute(_author_months, {"user_id": user_id, "months": months}).all()
+
+
+def taken(email: str | None, username: str | None) -> Row:
+    """
+    The function `taken` tells, with a single query, whether any user (deleted or not) already has the
+    given email and whether any has the given username.
+
+    :return: a row with the boolean columns `email` and `username`. A None argument is never taken.
+    """
+    return db.session.execute(
+        _taken, {"email": email, "username": username}, execution_options=_with_deleted
+    ).one()
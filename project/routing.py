@@ -0,0 +1,188 @@
+"""
+Read/write session routing
+- Reads of views marked with `read_only` go to a replica engine
+- Flushes and INSERT/UPDATE/DELETE statements always go to the primary
+- After a user's own commit their reads stick to the primary for a while (read-your-writes)
+"""
+
+import os
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Iterable, Iterator, TypeVar
+import click
+import sqlalchemy as sa
+from flask import Flask, Response, current_app, has_request_context, request
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+T = TypeVar("T")
+
+# Set while a view decorated with `read_only` is running.
+_read_only: ContextVar[bool] = ContextVar("read_only", default=False)
+
+# Cookie holding the time until which the user reads from the primary. It expires with the marker,
+# so it never outlives `REPLICA_STICKY_SECONDS` and the session is not written for it.
+STICKY_COOKIE = "rw_until"
+# Key of the WSGI environ holding the deadline until the response is sent. Unlike `g`, it survives the
+# nested app contexts the views commit in.
+STICKY_ENVIRON_KEY = "puppyblog.sticky_until"
+
+
+def read_only(view):
+    """
+    The decorator `read_only` marks a view (or a Resource method) whose queries can be served by a
+    replica.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+
+    return wrapper
+
+
+def read_only_stream(chunks: Iterable[T]) -> Iterator[T]:
+    """
+    The function `read_only_stream` marks the queries of a streamed response body as read only. The
+    body runs after its `read_only` view returned, so the view's mark no longer applies to it.
+    """
+    iterator = iter(chunks)
+    while True:
+        token = _read_only.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_only.reset(token)
+        yield chunk
+
+
+def use_replica() -> bool:
+    """
+    The function `use_replica` tells whether the current query may be served by a replica: only inside
+    a `read_only` view and when the user did not commit anything in the last `REPLICA_STICKY_SECONDS`.
+    """
+    if not _read_only.get():
+        return False
+    if has_request_context() and _sticky_until() > time.time():
+        return False
+    return True
+
+
+def _sticky_until() -> float:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+# The `RoutingSession` class is the session used by `db`. It picks a replica engine for reads and the
+# primary engine for everything else.
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and use_replica()
+        ):
+            replicas = current_app.extensions.get("sqlalchemy_replicas")
+            if replicas:
+                return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@sa.event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(db_session, flush_context):
+    db_session.info["wrote"] = True
+
+
+@sa.event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@sa.event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(db_session):
+    # Only browsers holding a session come back for their own writes. API clients get no cookie.
+    if (
+        db_session.info.pop("wrote", False)
+        and has_request_context()
+        and current_app.config["SESSION_COOKIE_NAME"] in request.cookies
+    ):
+        request.environ[STICKY_ENVIRON_KEY] = time.time() + current_app.config["REPLICA_STICKY_SECONDS"]
+
+
+@sa.event.listens_for(RoutingSession, "after_rollback")
+def _clear_mark(db_session):
+    db_session.info.pop("wrote", None)
+
+
+def _set_sticky_cookie(response: Response) -> Response:
+    until = request.environ.pop(STICKY_ENVIRON_KEY, None)
+    if until is not None:
+        response.set_cookie(
+            STICKY_COOKIE,
+            f"{until:.3f}",
+            max_age=current_app.config["REPLICA_STICKY_SECONDS"],
+            httponly=True,
+            secure=current_app.config["SESSION_COOKIE_SECURE"],
+            samesite=current_app.config["SESSION_COOKIE_SAMESITE"],
+        )
+    return response
+
+
+def init_replicas(app: Flask):
+    """
+    The function `init_replicas` creates one engine per uri in `SQLALCHEMY_REPLICA_URIS`. With no
+    replicas configured every query keeps using the primary.
+    """
+    app.config.setdefault("SQLALCHEMY_REPLICA_URIS", [])
+    app.config.setdefault("REPLICA_STICKY_SECONDS", 10)
+    app.extensions["sqlalchemy_replicas"] = [
+        sa.create_engine(uri) for uri in app.config["SQLALCHEMY_REPLICA_URIS"]
+    ]
+    app.after_request(_set_sticky_cookie)
+    app.cli.add_command(replica_cli)
+
+
+def _sqlite_path(uri: str) -> str:
+    url = sa.make_url(uri)
+    if not url.get_backend_name() == "sqlite" or not url.database:
+        raise click.ClickException(f"{uri} is not a SQLite file database.")
+    return url.database.removeprefix("file:") if url.query.get("uri") else url.database
+
+
+replica_cli = AppGroup("replica", help="Manage local SQLite read replicas.")
+
+
+@replica_cli.command("sync")
+@click.argument("paths", nargs=-1)
+def sync_command(paths: tuple[str, ...]):
+    """Copy the primary SQLite database to the replica files.
+
+    Copies to PATHS, or to every SQLite replica in SQLALCHEMY_REPLICA_URIS when no path is given.
+    """
+    primary = _sqlite_path(current_app.config["SQLALCHEMY_DATABASE_URI"])
+    targets = list(paths) or [_sqlite_path(uri) for uri in current_app.config["SQLALCHEMY_REPLICA_URIS"]]
+    if not targets:
+        raise click.ClickException("No replica paths given or configured.")
+    source = sqlite3.connect(primary)
+    for target in targets:
+        start = time.perf_counter()
+        dest = sqlite3.connect(os.path.abspath(target))
+        # The backup API takes a consistent snapshot even while the app keeps writing.
+        source.backup(dest)
+        dest.close()
+        click.echo(f"{primary} -> {target} ({time.perf_counter() - start:.2f}s)")
+    source.close()
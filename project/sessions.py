@@ -0,0 +1,221 @@
+"""
+Server side sessions
+- The cookie only holds a signed random session id, the data lives in a cache backend
+- Backends: "memory" (one process), "sqlite" (every process of a node), "redis" (every node)
+- The data is loaded on first access and written back only when the session was modified
+"""
+
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterator
+from cachelib import BaseCache, RedisCache, SimpleCache
+from flask import Flask, Request, Response
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+
+KEY_PREFIX = "session:"
+
+
+# The `SQLiteCache` class is a cachelib backend keeping string values in a SQLite file. Every process
+# of a node can share it, which makes it the local stand-in of a shared store like Redis.
+class SQLiteCache(BaseCache):
+    def __init__(self, path: str, default_timeout: int = 300, cleanup_rate: float = 0.01):
+        super().__init__(default_timeout)
+        self.path = path
+        self.cleanup_rate = cleanup_rate
+        # Connections are opened on first use, one per thread of each process: the cache is created at
+        # import, before the server forks its workers, and a SQLite connection must not cross a fork.
+        self._pid: int | None = None
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._pid, self._local = os.getpid(), threading.local()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _expires(self, timeout: int | None) -> float | None:
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout else None
+
+    def get(self, key: str) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Any, timeout: int | None = None) -> bool:
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, value, self._expires(timeout)),
+        )
+        # Expired rows are never read; drop them now and then instead of on every write.
+        if random.random() < self.cleanup_rate:
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        return True
+
+    def add(self, key: str, value: Any, timeout: int | None = None) -> bool:
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key: str) -> bool:
+        return self._connection().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount > 0
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def clear(self) -> bool:
+        self._connection().execute("DELETE FROM cache")
+        return True
+
+
+# The `ServerSession` class is the session of a request. Its data is only fetched from the backend the
+# first time it is read or written, so requests that never touch the session cost no backend call.
+class ServerSession(SessionMixin):
+    def __init__(self, sid: str | None, loader: Callable[[], dict | None]):
+        self.sid = sid
+        self.stale_sid: str | None = None
+        self.modified = False
+        self.accessed = False
+        self._loader = loader
+        self._data: dict | None = None if sid else {}
+
+    @property
+    def data(self) -> dict:
+        self.accessed = True
+        if self._data is None:
+            self._data = self._loader()
+            if self._data is None:
+                # Expired or unknown session: start a new one.
+                self._data, self.sid = {}, None
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key: str):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def regenerate(self):
+        """
+        The function gives the session a new id, keeping its data. Call it when the user logs in, so a
+        session id known before the login cannot be used to ride the logged in session.
+        """
+        self.data  # the data must be loaded before the old id is dropped
+        if self.sid:
+            self.stale_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+# The `ServerSessionInterface` class stores the sessions in a cachelib backend.
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, cache: BaseCache):
+        self.cache = cache
+
+    def _signer(self, app: Flask) -> Signer:
+        return Signer(app.secret_key, salt="server-session")  # type: ignore
+
+    def _load(self, sid: str) -> dict | None:
+        value = self.cache.get(KEY_PREFIX + sid)
+        return None if value is None else session_json_serializer.loads(value)
+
+    def open_session(self, app: Flask, request: Request) -> ServerSession:
+        sid = None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                # Forged or signed with an old key: never reaches the backend.
+                sid = None
+        return ServerSession(sid, lambda: self._load(sid))  # type: ignore
+
+    def save_session(self, app: Flask, session: ServerSession, response: Response):  # type: ignore
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.stale_sid:
+            self.cache.delete(KEY_PREFIX + session.stale_sid)
+        if not session.modified:
+            return
+        name, domain, path = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.sid:
+                self.cache.delete(KEY_PREFIX + session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        timeout = int(app.permanent_session_lifetime.total_seconds())
+        self.cache.set(KEY_PREFIX + session.sid, session_json_serializer.dumps(dict(session)), timeout)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def make_cache(app: Flask) -> BaseCache:
+    """
+    The function `make_cache` creates the backend named by `SESSION_BACKEND`. A `BaseCache` instance
+    can also be configured directly.
+    """
+    backend = app.config["SESSION_BACKEND"]
+    if isinstance(backend, BaseCache):
+        return backend
+    if backend == "memory":
+        return SimpleCache(threshold=10000)
+    if backend == "sqlite":
+        path = app.config["SESSION_SQLITE_PATH"] or os.path.join(app.instance_path, "sessions.db")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteCache(path)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('SESSION_BACKEND "redis" needs the redis package: pip install redis')
+        return RedisCache(redis.from_url(app.config["SESSION_REDIS_URL"]))
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+
+
+def init_sessions(app: Flask):
+    """
+    The function `init_sessions` replaces the signed cookie sessions by server side sessions stored in
+    the `SESSION_BACKEND` backend.
+    """
+    app.config.setdefault("SESSION_BACKEND", "sqlite")
+    app.config.setdefault("SESSION_SQLITE_PATH", None)
+    app.config.setdefault("SESSION_REDIS_URL", "redis://localhost:6379/0")
+    app.session_interface = ServerSessionInterface(make_cache(app))
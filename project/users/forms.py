@@ -1,11 +1,10 @@
 from flask_wtf import FlaskForm
 from wtforms import EmailField, StringField, PasswordField, SubmitField
 from wtforms.validators import EqualTo, DataRequired
-from wtforms import ValidationError
 from flask_wtf.file import FileField, FileAllowed
 from flask_login import current_user
 from project.models import User
-from project import app, db
+from project import repository
 
 
 # The `LoginForm` class represents a form with an email field, a password field, and a submit button
@@ -31,15 +30,20 @@ class RegistrationForm(FlaskForm):
     password_confirm = PasswordField("Password", validators=[DataRequired()])
     submit = SubmitField("Register")
 
-    def validate_email(self, email):
-        with app.app_context():
-            if User.query.filter_by(email=self.email.data).first():
-                raise ValidationError("Your email is already registered!")
-
-    def validate_username(self, username):
-        with app.app_context():
-            if User.query.filter_by(username=self.username.data).first():
-                raise ValidationError("Your username is already registered!")
+    def validate(self, extra_validators=None):
+        """
+        The function runs the field validators and then checks that neither the email nor the username
+        is registered, both with a single query. The unique indexes still have the last word when the
+        user is inserted.
+        """
+        if not super().validate(extra_validators):
+            return False
+        taken = repository.taken(self.email.data, self.username.data)
+        if taken.email:
+            self.email.errors.append("Your email is already registered!") # type: ignore
+        if taken.username:
+            self.username.errors.append("Your username is already registered!") # type: ignore
+        return not (taken.email or taken.username)
 
 
 # The UpdateForm class is a FlaskForm used for updating user data.
@@ -1,68 +1,163 @@
+import hashlib
 import os
+import secrets
+import tempfile
+import time
+from typing import Callable
 import requests
 from PIL import Image
-from flask import url_for, current_app
+from flask import current_app
 from io import BytesIO
 from flask_wtf.file import FileStorage
 
+DEFAULT_PICTURE = "default_profile.png"
+OUTPUT_SIZE = (200, 200)
+# Pillow format -> file extension. Any other format is stored as PNG.
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+TMP_PREFIX = ".tmp-"
+
+
+def pictures_dir() -> str:
+    '''The function `pictures_dir` returns the directory the profile pictures are stored in.'''
+    return os.path.join(current_app.root_path, "static", "profile_imgs")
+
+
+def store_picture(data: bytes) -> str:
+    '''The function `store_picture` resizes an image and stores it under a name derived from its
+    content, so the same picture is only stored once whoever uploads it.
+
+    The format is detected from the bytes, never from the file name. The file is written to a temporary
+    file in the same directory and renamed into place, so concurrent workers never leave a truncated
+    picture behind: readers see either no file or the complete one.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the image file.
+
+    Returns
+    -------
+        the filename of the stored profile picture.
+
+    '''
+    pic = Image.open(BytesIO(data))
+    image_format = pic.format if pic.format in EXTENSIONS else "PNG"
+    pic.thumbnail(OUTPUT_SIZE)
+    if image_format == "JPEG" and pic.mode not in ("RGB", "L"):
+        pic = pic.convert("RGB")
+    output = BytesIO()
+    pic.save(output, format=image_format)
+    content = output.getvalue()
+
+    storage_filename = hashlib.sha256(content).hexdigest()[:32] + "." + EXTENSIONS[image_format]
+    filepath = os.path.join(pictures_dir(), storage_filename)
+    try:
+        # Already stored: refresh its age so the garbage collector's grace period starts again.
+        os.utime(filepath)
+        return storage_filename
+    except FileNotFoundError:
+        # Not stored yet, or collected in the meantime: write it.
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=pictures_dir(), prefix=TMP_PREFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return storage_filename
+
+
+def add_profile_pic(pic_upload: FileStorage):
+    '''The function `add_profile_pic` stores an uploaded profile picture.
 
-def add_profile_pic(pic_upload: FileStorage, username: str):
-    '''The function `add_profile_pic` takes a file upload and a username as input, renames the file to
-    match the username, resizes the image to a specified size, and saves it to a specified filepath.
-    
     Parameters
     ----------
     pic_upload : FileStorage
         The `pic_upload` parameter is of type `FileStorage` and represents the uploaded profile picture
     file.
-    username : str
-        The `username` parameter is a string that represents the username of the user for whom the profile
-    picture is being uploaded.
-    
+
     Returns
     -------
         the filename of the stored profile picture.
-    
+
     '''
-    # blablabla.jpg --> username.jpg
-    filename: str = pic_upload.filename # type: ignore
-    ext_type = filename.split(".")[-1]
-    storage_filename = str(username) + "." + ext_type
-    filepath = os.path.join(
-        current_app.root_path, "static", "profile_imgs", storage_filename
-    )
-    output_size = (200, 200)
-    pic = Image.open(pic_upload) # type: ignore
-    pic.thumbnail(output_size)
-    pic.save(filepath)
-    return storage_filename
+    return store_picture(pic_upload.read())
+
 
+def picture_from_url(url: str):
+    '''The function `picture_from_url` downloads an image from a given URL and stores it as a profile
+    picture.
 
-def picture_from_url(url: str, username: str):
-    '''The function `picture_from_url` downloads an image from a given URL, resizes it to 200x200 pixels,
-    and saves it to a specified filepath with a filename based on the given username.
-    
     Parameters
     ----------
     url : str
         The `url` parameter is a string that represents the URL of the image you want to download and save.
-    username : str
-        The `username` parameter is a string that represents the username of the user for whom the profile
-    picture is being saved.
-    
+
     Returns
     -------
         the filename of the saved picture.
-    
+
     '''
-    ext_type = url.split(".")[-1]
-    storage_filename = str(username) + "." + ext_type
-    filepath = os.path.join(
-        current_app.root_path, "static", "profile_imgs", storage_filename
-    )
-    response = requests.get(url)
-    output_size = (200, 200)
-    pic = Image.open(BytesIO(response.content))
-    pic.thumbnail(output_size)
-    pic.save(filepath)
-    return storage_filename
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return store_picture(response.content)
+
+
+def _remove_unused(path: str, cutoff: float, is_referenced: Callable[[str], bool] | None) -> bool:
+    # The file is renamed out of the way before the last checks. A writer refreshing it before the
+    # rename shows in its mtime, a writer coming after the rename stores it again.
+    doomed = os.path.join(os.path.dirname(path), f"{TMP_PREFIX}gc-{secrets.token_hex(8)}")
+    try:
+        os.rename(path, doomed)
+    except FileNotFoundError:
+        return False
+    if os.stat(doomed).st_mtime > cutoff or (is_referenced and is_referenced(os.path.basename(path))):
+        # Same name, same content: putting it back is safe even if a writer stored it again.
+        os.replace(doomed, path)
+        return False
+    os.remove(doomed)
+    return True
+
+
+def collect_garbage(
+    referenced: set[str], grace_seconds: float = 3600, is_referenced: Callable[[str], bool] | None = None
+) -> tuple[int, int]:
+    '''The function `collect_garbage` deletes the pictures no user references any more, and temporary
+    files left by crashed writers.
+
+    Files younger than `grace_seconds` are kept: a picture is stored before the user row pointing to it
+    is committed. Storing a picture again refreshes its age, and both checks are repeated right before
+    a file is deleted, so a picture stored or referenced while the collection runs is kept.
+
+    Parameters
+    ----------
+    referenced : set[str]
+        The filenames referenced by `users.profile_img`.
+    grace_seconds : float
+        The minimum age of a file before it can be deleted.
+    is_referenced : Callable[[str], bool], optional
+        Tells whether a filename is referenced now, checked again right before deleting the file.
+
+    Returns
+    -------
+        the number of files deleted and the number of bytes reclaimed.
+
+    '''
+    cutoff = time.time() - grace_seconds
+    deleted, reclaimed = 0, 0
+    with os.scandir(pictures_dir()) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced or entry.name == DEFAULT_PICTURE:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff or not _remove_unused(entry.path, cutoff, is_referenced):
+                continue
+            deleted += 1
+            reclaimed += stat.st_size
+    return deleted, reclaimed
@@ -9,19 +9,25 @@ Views needed:
 """
 
 from flask import (
+    abort,
     flash,
     render_template,
     redirect,
     Blueprint,
     request,
+    session,
     url_for,
 )
+from uuid import uuid4
+from sqlalchemy.exc import IntegrityError
 from flask_login import login_user, current_user, logout_user, login_required
 from project import app, db
-from flask_wtf.file import FileStorage
+from project import repository
 from project.models import User, BlogPost
 from project.users.forms import LoginForm, RegistrationForm, UpdateForm
-from project.users.picture_handler import add_profile_pic
+from project.jobs.queue import enqueue
+from project.jobs.tasks import spool_path
+from project.routing import read_only
 
 users = Blueprint("users", __name__)
 
@@ -42,7 +48,13 @@ def register():
         )
         with app.app_context():
             db.session.add(user)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Someone registered the same email or username since the form was validated.
+                db.session.rollback()
+                flash("Your email or username is already registered!", "danger")
+                return render_template("register.html", form=form)
         flash("Thanks for your registration!", "success")
         return redirect(url_for("users.login"))
     return render_template("register.html", form=form)
@@ -58,7 +70,7 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         with app.app_context():
-            user = User.query.filter_by(email=form.email.data).first()
+            user = repository.get_user_by_email(form.email.data) # type: ignore
         if not user:
             form.password.data = ""
             form.email.data = ""
@@ -66,6 +78,7 @@ def login():
             return render_template("login.html", form=form)
         if user.check_password(form.password.data):
             login_user(user)
+            session.regenerate()  # type: ignore
             flash(f"Loged in as {user.username}.", "success")
             next = request.args.get("next")
             if next == None or not next[0] == "/":
@@ -79,15 +92,21 @@ def login():
 
 @users.route("/acount")
 @login_required
+@read_only
 def account():
     """
-    The function `account()` renders the account.html template with the current user's information and
-    profile image.
-    :return: the rendered template "account.html" with the variables "user" and "profile_img".
+    The function `account()` renders the account.html template with the current user's information,
+    profile image and post statistics.
+    :return: the rendered template "account.html" with the variables "user", "profile_img", "stats"
+    and "months".
     """
     user: User = current_user # type: ignore
     profile_img = url_for("static", filename="profile_imgs/" + user.profile_img)
-    return render_template("account.html", user=user, profile_img=profile_img)
+    with app.app_context():
+        stats, months = repository.get_author_stats(user.id)
+    return render_template(
+        "account.html", user=user, profile_img=profile_img, stats=stats, months=months
+    )
 
 
 @users.route("/update", methods=["GET", "POST"])
@@ -108,10 +127,13 @@ def update():
             return redirect(url_for("users.update"))
         updated = []
         with app.app_context():
-            user = User.query.filter_by(email=current_user.email).first() # type: ignore
+            user = repository.get_user_by_email(current_user.email) # type: ignore
             if form.picture.data:
-                pic: FileStorage = add_profile_pic(form.picture.data, user.username) # type: ignore
-                user.profile_img = pic # type: ignore
+                # Only spool the upload here, resizing it is left to a worker.
+                filename = form.picture.data.filename
+                path = spool_path(uuid4().hex)
+                form.picture.data.save(path)
+                enqueue("process_profile_picture", user_id=user.id, path=path, filename=filename) # type: ignore
                 updated.append("profile picture")
             if form.username.data and form.username.data != user.username: # type: ignore
                 user.username = form.username.data # type: ignore
@@ -131,6 +153,7 @@ def update():
 
 @users.route("/<username>")
 # @login_required
+@read_only
 def posts(username: str):
     """
     The `posts` function retrieves and paginates blog posts written by a specific user and renders them
@@ -143,10 +166,12 @@ def posts(username: str):
     """
     page = request.args.get("page", 1, int)
     with app.app_context():
-        user = User.query.filter_by(username=username).first_or_404()
+        user = repository.get_user_summary(username)
+        if user is None:
+            abort(404)
         posts = (
-            BlogPost.query.filter_by(author=user)
-            .order_by(BlogPost.created_at.desc())
+            BlogPost.query.filter_by(user_id=user.id)
+            .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
             .paginate(page=page, per_page=5)
         )
         print(posts.first, posts.has_next, posts.has_prev, flush=True)
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import pytest
+
+# The app is configured when `project` is imported: point it at a throwaway database first.
+_tmp = tempfile.mkdtemp(prefix="puppyblog-tests-")
+os.environ["FLASK_SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(_tmp, "test.db")
+os.environ["FLASK_TESTING"] = "true"
+os.environ["FLASK_SECRET_KEY"] = "test-secret-key"
+os.environ["FLASK_SESSION_BACKEND"] = "memory"
+os.environ["FLASK_WTF_CSRF_ENABLED"] = "false"
+
+from project import app as flask_app, db  # noqa: E402
+from project.models import User  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """
+    A user created for the test. Every user and post is deleted afterwards.
+    """
+    with app.app_context():
+        user = User(email="tester@example.com", username="tester", password="password")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    yield user_id
+    with app.app_context():
+        db.session.execute(db.delete(User))
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name not in ("users", "cache_versions", "jobs"):
+                db.session.execute(table.delete())
+        db.session.execute(db.metadata.tables["jobs"].delete())
+        db.session.commit()
@@ -0,0 +1,78 @@
+from sqlalchemy import select, update
+from project import db
+from project.maintenance.commands import recompute_command
+from project.models import AuthorMonth, AuthorStats, BlogPost
+from project.posts.indexing import rebuild_author_stats
+from tests.test_posts import create_post
+
+
+def snapshot() -> tuple[list, list]:
+    stats = db.session.execute(
+        select(
+            AuthorStats.user_id,
+            AuthorStats.post_count,
+            AuthorStats.word_count,
+            AuthorStats.first_post_at,
+            AuthorStats.last_post_at,
+        ).order_by(AuthorStats.user_id)
+    ).all()
+    months = db.session.execute(
+        select(AuthorMonth.user_id, AuthorMonth.year, AuthorMonth.month, AuthorMonth.post_count)
+        .order_by(AuthorMonth.user_id, AuthorMonth.year, AuthorMonth.month)
+    ).all()
+    return stats, months
+
+
+def assert_matches_rebuild(app):
+    with app.app_context():
+        incremental = snapshot()
+        rebuild_author_stats()
+        assert snapshot() == incremental
+        db.session.rollback()
+        return incremental
+
+
+def post_ids(app, user_id):
+    with app.app_context():
+        return db.session.scalars(
+            select(BlogPost.id).where(BlogPost.user_id == user_id).order_by(BlogPost.id)
+        ).all()
+
+
+def test_author_stats_follow_post_writes(app, client, user):
+    for date in ("2024-01-05", "2024-01-20", "2024-03-01", "2024-05-01"):
+        create_post(client, user, text="one two three", created_at=f"{date} 10:00:00")
+    first, january, march, last = post_ids(app, user)
+    (stats,), months = assert_matches_rebuild(app)
+    assert (stats.post_count, stats.word_count) == (4, 12)
+    assert [(month.month, month.post_count) for month in months] == [(1, 2), (3, 1), (5, 1)]
+
+    client.post("/login", data={"email": "tester@example.com", "password": "password"})
+    client.post(f"/posts/{march}/update", data={"title": "Edited", "text": "one two three four five"})
+    (stats,), _ = assert_matches_rebuild(app)
+    assert stats.word_count == 14
+
+    # Deleting the first and the last post moves both dates.
+    client.post(f"/posts/{first}/delete")
+    client.post(f"/posts/{last}/delete")
+    (stats,), months = assert_matches_rebuild(app)
+    assert (stats.post_count, stats.first_post_at.month, stats.last_post_at.month) == (2, 1, 3)
+    assert [(month.month, month.post_count) for month in months] == [(1, 1), (3, 1)]
+
+    client.post(f"/posts/{january}/delete")
+    client.post(f"/posts/{march}/delete")
+    assert assert_matches_rebuild(app) == ([], [])
+
+
+def test_recompute_counts_words(app, client, user):
+    create_post(client, user, text="one two three")
+    with app.app_context():
+        db.session.execute(update(BlogPost).values(word_count=0))
+        rebuild_author_stats()
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(recompute_command)
+
+    assert result.exit_code == 0, result.output
+    (stats,), _ = assert_matches_rebuild(app)
+    assert stats.word_count == 3
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+import pytest
+from sqlalchemy import create_engine
+from project import db
+from project.feeds import views
+from project.models import User
+from tests.test_posts import create_post
+
+
+@pytest.fixture
+def paris_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Paris")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_feed_dates_are_utc(client, user, paris_time):
+    create_post(client, user, created_at="2024-01-02 03:04:05")
+
+    atom = client.get("/feed.atom").get_data(as_text=True)
+    rss = client.get("/feed.rss").get_data(as_text=True)
+
+    assert "<updated>2024-01-02T02:04:05+00:00</updated>" in atom
+    assert "<pubDate>Tue, 02 Jan 2024 02:04:05 +0000</pubDate>" in rss
+
+
+def test_user_shards_leave_room_for_static_urls(app, client, user, monkeypatch):
+    monkeypatch.setattr(views, "SITEMAP_MAX_URLS", 7)
+    monkeypatch.setitem(views.SHARDS, "users", (User, 7 - len(views.STATIC_ENDPOINTS)))
+    with app.app_context():
+        for i in range(3):
+            db.session.add(User(f"user{i}@example.com", f"user{i}", "password"))
+        db.session.commit()
+        max_id = db.session.scalar(db.select(db.func.max(User.id)))
+    n_shards = -(-max_id // 2)
+
+    index = client.get("/sitemap.xml").get_data(as_text=True)
+    shards = [client.get(f"/sitemap-users-{shard}.xml").get_data(as_text=True) for shard in range(n_shards)]
+
+    assert index.count("/sitemap-users-") == n_shards
+    assert shards[0].count("<url>") == 7
+    assert all(0 < shard.count("<url>") <= 7 for shard in shards)
+
+
+def test_sitemap_is_streamed_from_the_replica(app, client, user, tmp_path, monkeypatch):
+    replica_path = tmp_path / "replica.db"
+    with app.app_context():
+        primary = sqlite3.connect(db.engine.url.database)
+        replica = sqlite3.connect(replica_path)
+        primary.backup(replica)
+        primary.close()
+        replica.close()
+        # Only on the primary: the sitemap must not list it.
+        db.session.add(User("primary@example.com", "primaryonly", "password"))
+        db.session.commit()
+    engine = create_engine(f"sqlite:///{replica_path}")
+    monkeypatch.setitem(app.extensions, "sqlalchemy_replicas", [engine])
+
+    sitemap = client.get("/sitemap.xml").get_data(as_text=True)
+
+    assert "/tester" in sitemap
+    assert "primaryonly" not in sitemap
+    engine.dispose()
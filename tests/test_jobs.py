@@ -0,0 +1,125 @@
+import os
+import time
+from datetime import datetime
+from sqlalchemy import select, update
+from project import db
+from project.jobs import queue, tasks
+from project.jobs.queue import METRICS, TASKS, claim, enqueue, run_job, task, work
+from project.jobs.tasks import spool_path
+from project.models import BlogPost, Job
+from project.posts.rendering import RENDERER_VERSION
+from tests.test_posts import create_post
+
+LEASE = 0.3
+seen: list = []
+
+
+@task("test_outlive_lease")
+def outlive_lease():
+    time.sleep(LEASE * 2)
+    with db.engine.connect() as conn:
+        seen.append(conn.scalar(select(Job.__table__.c.locked_until)))
+
+
+@task("test_lose_lease")
+def lose_lease():
+    with db.engine.begin() as conn:
+        conn.execute(update(Job.__table__).values(locked_by="other-worker"))
+
+
+@task("test_noop")
+def noop():
+    pass
+
+
+def run(app, task_name):
+    with app.app_context():
+        enqueue(task_name)
+        db.session.commit()
+        job = claim("test-worker", lease_seconds=LEASE)
+        run_job(job, "test-worker", lease_seconds=LEASE)
+        return db.session.scalars(select(Job)).one()
+
+
+def test_tasks_are_registered():
+    assert {"fetch_profile_picture", "purge_user", "rerender_posts"} <= TASKS.keys()
+
+
+def test_lease_is_extended_while_running(app, user):
+    job = run(app, "test_outlive_lease")
+
+    assert job.status == "done"
+    assert seen[-1] > datetime.now()
+
+
+def test_heartbeat_stops_before_the_job_is_settled(app, user, monkeypatch, caplog):
+    finish = queue._finish
+
+    def slow_finish(*args, **values):
+        settled = finish(*args, **values)
+        time.sleep(LEASE)  # a beat running now would find the lease released
+        return settled
+
+    monkeypatch.setattr(queue, "_finish", slow_finish)
+    job = run(app, "test_noop")
+
+    assert job.status == "done"
+    assert "lost its lease" not in caplog.text
+
+
+def test_lost_lease_is_not_settled(app, user):
+    lost = METRICS["lost"]
+
+    job = run(app, "test_lose_lease")
+
+    assert job.status == "running" and job.locked_by == "other-worker"
+    assert METRICS["lost"] == lost + 1
+
+
+def test_rerender_posts_in_batches(app, client, user):
+    for i in range(5):
+        create_post(client, user, text=f"Post *{i}*")
+    with app.app_context():
+        db.session.execute(update(BlogPost).values(text_html="", renderer_version=0))
+        enqueue("rerender_posts", batch_size=2, processes=1)
+        db.session.commit()
+
+        work(burst=True)
+
+        statuses = db.session.scalars(select(Job.status).where(Job.task == "rerender_posts")).all()
+        assert statuses == ["done"] * 4
+        posts = db.session.scalars(select(BlogPost).order_by(BlogPost.id)).all()
+        assert {post.renderer_version for post in posts} == {RENDERER_VERSION}
+        assert "<em>4</em>" in posts[-1].text_html
+
+
+def test_upload_that_is_not_an_image_is_dropped(app, user):
+    with app.app_context():
+        path = spool_path("not-an-image")
+        with open(path, "wb") as f:
+            f.write(b"not an image")
+        enqueue("process_profile_picture", user_id=user, path=path, filename="dog.png")
+        db.session.commit()
+
+        work(burst=True)
+
+        assert db.session.scalars(select(Job.status)).one() == "done"
+        assert not os.path.exists(path)
+
+
+def test_spool_file_is_removed_when_the_job_fails_for_good(app, user, monkeypatch):
+    def broken(upload):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tasks, "add_profile_pic", broken)
+    with app.app_context():
+        path = spool_path("picture")
+        with open(path, "wb") as f:
+            f.write(b"picture")
+        enqueue("process_profile_picture", max_attempts=1, user_id=user, path=path, filename="dog.png")
+        db.session.commit()
+
+        work(burst=True)
+
+        assert db.session.scalars(select(Job.status)).one() == "failed"
+        assert not os.path.exists(path)
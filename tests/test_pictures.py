@@ -0,0 +1,51 @@
+import os
+from io import BytesIO
+import pytest
+from PIL import Image
+from project.users import picture_handler
+from project.users.picture_handler import collect_garbage, store_picture
+
+
+@pytest.fixture
+def pictures(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(picture_handler, "pictures_dir", lambda: str(tmp_path))
+    with app.app_context():
+        yield tmp_path
+
+
+def png() -> bytes:
+    output = BytesIO()
+    Image.new("RGB", (300, 300), "brown").save(output, format="PNG")
+    return output.getvalue()
+
+
+def age(path, seconds=7200):
+    os.utime(path, (os.path.getatime(path) - seconds, os.path.getmtime(path) - seconds))
+
+
+def test_store_picture_twice_refreshes_it(pictures):
+    name = store_picture(png())
+    age(pictures / name)
+
+    assert store_picture(png()) == name
+    assert collect_garbage(set()) == (0, 0)
+
+
+def test_store_picture_again_after_collection(pictures):
+    name = store_picture(png())
+    age(pictures / name)
+    assert collect_garbage(set())[0] == 1
+
+    assert store_picture(png()) == name
+    assert (pictures / name).exists()
+
+
+def test_collect_garbage_checks_again_before_deleting(pictures):
+    name = store_picture(png())
+    age(pictures / name)
+
+    # Referenced by a user committed after the referenced set was read.
+    assert collect_garbage(set(), is_referenced=lambda filename: filename == name) == (0, 0)
+    # Stored again while the collection runs: the writer stores a new copy.
+    collect_garbage(set(), is_referenced=lambda filename: store_picture(png()) != filename)
+    assert os.listdir(pictures) == [name]
@@ -0,0 +1,57 @@
+from project import db
+from project.models import BlogPost, PostViews
+from project.posts.counters import view_counter
+
+
+def create_post(client, user_id, **fields):
+    data = {"user_id": user_id, "title": "A post", "text": "Some *text*", **fields}
+    return client.post("/api/createpost", json=data)
+
+
+def test_view_post_shows_tags(app, client, user):
+    response = create_post(client, user, tags="dogs, cats")
+    assert response.status_code == 200
+    with app.app_context():
+        post_id = db.session.scalar(db.select(BlogPost.id).where(BlogPost.user_id == user))
+
+    response = client.get(f"/posts/{post_id}")
+
+    assert response.status_code == 200
+    assert b"dogs" in response.data and b"cats" in response.data
+    assert b"<em>text</em>" in response.data
+
+
+def test_view_missing_post(client):
+    assert client.get("/posts/999999").status_code == 404
+
+
+def test_create_post_rejects_invalid_tags(client, user):
+    for tags in (5, {"name": "dogs"}, ["dogs", 5]):
+        response = create_post(client, user, tags=tags)
+        assert response.status_code == 404
+        assert "tags" in response.json["error"]
+
+
+def test_create_post_accepts_tag_list(client, user):
+    response = create_post(client, user, tags=["Dogs", "dogs", "puppies"])
+
+    assert response.status_code == 200
+    assert response.json["post"]["tags"] == ["dogs", "puppies"]
+
+
+def test_deleted_post_leaves_no_view_count(app, client, user):
+    create_post(client, user)
+    with app.app_context():
+        post_id = db.session.scalar(db.select(BlogPost.id).where(BlogPost.user_id == user))
+    client.get(f"/posts/{post_id}")
+    view_counter.flush()
+    client.post("/login", data={"email": "tester@example.com", "password": "password"})
+
+    client.post(f"/posts/{post_id}/delete")
+    # A view read before the delete, flushed after it.
+    view_counter.record(post_id)
+    view_counter.flush()
+
+    with app.app_context():
+        assert db.session.get(BlogPost, post_id) is None
+        assert db.session.scalars(db.select(PostViews)).all() == []
@@ -0,0 +1,38 @@
+import time
+from project.routing import STICKY_COOKIE, read_only, use_replica
+from tests.test_posts import create_post
+
+use_replica_view = read_only(use_replica)
+
+
+def test_api_write_sets_no_cookie(client, user):
+    response = create_post(client, user)
+
+    assert response.status_code == 200
+    assert "Set-Cookie" not in response.headers
+
+
+def test_browser_write_sticks_to_primary(app, client, user):
+    client.set_cookie(app.config["SESSION_COOKIE_NAME"], "session-id")
+
+    response = create_post(client, user)
+
+    cookie = client.get_cookie(STICKY_COOKIE)
+    assert cookie is not None and float(cookie.value) > time.time()
+    assert f"Max-Age={app.config['REPLICA_STICKY_SECONDS']}" in response.headers["Set-Cookie"]
+    with app.test_request_context(headers={"Cookie": f"{STICKY_COOKIE}={cookie.value}"}):
+        assert not use_replica_view()
+    with app.test_request_context(headers={"Cookie": f"{STICKY_COOKIE}={time.time() - 1}"}):
+        assert use_replica_view()
+
+
+def test_form_write_sticks_to_primary(app, client, user):
+    client.post("/login", data={"email": "tester@example.com", "password": "password"})
+    assert client.get_cookie(app.config["SESSION_COOKIE_NAME"]) is not None
+    client.delete_cookie(STICKY_COOKIE)
+
+    response = client.post("/create", data={"title": "A post", "text": "Some text", "tags": "dogs"})
+
+    assert response.status_code == 302
+    cookie = client.get_cookie(STICKY_COOKIE)
+    assert cookie is not None and float(cookie.value) > time.time()
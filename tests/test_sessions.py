@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from project.sessions import SQLiteCache
+
+
+def test_sqlite_cache_connects_lazily_per_process(tmp_path):
+    path = tmp_path / "sessions.db"
+    cache = SQLiteCache(str(path))
+    assert not path.exists()
+
+    cache.set("key", "value")
+    parent = cache._connection()
+    pid = os.fork()
+    if pid == 0:
+        ok = cache.get("key") == "value" and cache._connection() is not parent
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache._connection() is parent
+
+
+def test_refuses_to_start_without_secret_key():
+    unset = ("FLASK_SECRET_KEY", "FLASK_TESTING", "FLASK_DEBUG")
+    env = {name: value for name, value in os.environ.items() if name not in unset}
+
+    result = subprocess.run([sys.executable, "-c", "import project"], env=env, capture_output=True, text=True)
+
+    assert result.returncode != 0
+    assert "FLASK_SECRET_KEY must be set" in result.stderr
@@ -0,0 +1,63 @@
+from sqlalchemy import func, select
+from project import db
+from project.jobs.queue import work
+from project.models import ArchiveMonth, BlogPost, Job, PostTag, Tag, User
+from project.posts.indexing import rebuild_indexes
+from tests.test_posts import create_post
+
+
+def create_user(client, **fields):
+    data = {"username": "tester", "email": "tester@example.com", "password": "password", **fields}
+    return client.post("/api/createuser", json=data)
+
+
+def test_create_duplicate_user_conflicts(client, user):
+    assert create_user(client).status_code == 409
+
+
+def test_create_duplicate_user_with_picture_conflicts(app, client, user):
+    response = create_user(client, picture_url="https://example.com/dog.png")
+
+    assert response.status_code == 409
+    assert "already registered" in response.json["error"]
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Job)) == 0
+
+
+def counts() -> tuple[dict, list]:
+    tags = {name: count for name, count in db.session.execute(select(Tag.name, Tag.post_count))}
+    months = db.session.execute(
+        select(ArchiveMonth.month, ArchiveMonth.post_count)
+        .where(ArchiveMonth.post_count > 0)
+        .order_by(ArchiveMonth.month)
+    ).all()
+    return tags, [tuple(month) for month in months]
+
+
+def test_deleted_user_is_hidden_then_purged(app, client, user):
+    create_user(client, username="other", email="other@example.com")
+    create_post(client, user, tags="dogs", created_at="2024-01-05 10:00:00")
+    create_post(client, user, tags="dogs, cats", created_at="2024-02-05 10:00:00")
+    with app.app_context():
+        other = db.session.scalar(select(User.id).where(User.username == "other"))
+    create_post(client, other, tags="dogs", created_at="2024-01-06 10:00:00")
+    remaining = ({"dogs": 1, "cats": 0}, [(1, 1)])
+
+    assert client.delete("/api/tester").status_code == 200
+
+    # Hidden at once, from the counts too, before the purge runs.
+    assert client.get("/api/tester").status_code == 404
+    with app.app_context():
+        assert db.session.scalars(select(BlogPost.user_id)).all() == [other]
+        assert counts() == remaining
+        rebuild_indexes()
+        assert counts() == remaining
+        db.session.rollback()
+
+        work(burst=True)
+
+        with_deleted = {"include_deleted": True}
+        assert db.session.get(User, user, execution_options=with_deleted) is None
+        assert db.session.scalars(select(BlogPost.user_id).execution_options(**with_deleted)).all() == [other]
+        assert db.session.scalar(select(func.count()).select_from(PostTag)) == 1
+        assert counts() == remaining
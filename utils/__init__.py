@@ -0,0 +1,5 @@
+import os
+
+# These scripts are development tools working on the local database. They run the app in debug mode,
+# where the development secret key is allowed, unless FLASK_DEBUG says otherwise.
+os.environ.setdefault("FLASK_DEBUG", "1")
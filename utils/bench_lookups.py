@@ -0,0 +1,48 @@
+from timeit import timeit
+from project import app, db, repository
+from project.models import User
+
+
+def bench(label: str, func, number: int):
+    """
+    The function `bench` runs `func` `number` times, each time in a fresh session like a request
+    would, and prints the average time per lookup.
+    """
+
+    def call():
+        func()
+        db.session.remove()
+
+    call()  # warm up the statement cache
+    seconds = timeit(call, number=number)
+    print(f"{label:<45} {seconds / number * 1e6:8.1f} us/lookup")
+
+
+def bench_lookups(number: int = 5000):
+    """
+    The function `bench_lookups` compares the per lookup overhead of the `User.query.filter_by(...)`
+    lookups with the precompiled statements of `project.repository`.
+
+    :param number: The `number` parameter is how many times each lookup is run
+    """
+    with app.app_context():
+        user = User.query.first()
+        if user is None:
+            print("No users in the db. Create some first.")
+            return
+        user_id, username, email = user.id, user.username, user.email
+        db.session.remove()
+
+        bench("query  filter_by(id=...)", lambda: User.query.filter_by(id=user_id).first(), number)
+        bench("repo   get_user", lambda: repository.get_user(user_id), number)
+        bench("query  filter_by(username=...)", lambda: User.query.filter_by(username=username).first(), number)
+        bench("repo   get_user_by_username", lambda: repository.get_user_by_username(username), number)
+        bench("repo   get_user_id", lambda: repository.get_user_id(username), number)
+        bench("repo   get_user_summary", lambda: repository.get_user_summary(username), number)
+        bench("query  filter_by(email=...)", lambda: User.query.filter_by(email=email).first(), number)
+        bench("repo   get_user_by_email", lambda: repository.get_user_by_email(email), number)
+        bench("repo   taken(email, username)", lambda: repository.taken(email, username), number)
+
+
+if __name__ == "__main__":
+    bench_lookups()
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from project import app
+from project.models import BlogPost
+from project.posts.counters import view_counter
+
+
+def hit(post_ids: list[int], n_requests: int):
+    """
+    The function `hit` requests `/posts/<id>` `n_requests` times, cycling over `post_ids`.
+    """
+    client = app.test_client()
+    for i in range(n_requests):
+        client.get(f"/posts/{post_ids[i % len(post_ids)]}")
+
+
+def bench(label: str, post_ids: list[int], n_requests: int, n_threads: int):
+    """
+    The function `bench` hits the post view from `n_threads` threads and prints the throughput.
+    """
+    start = perf_counter()
+    with ThreadPoolExecutor(n_threads) as pool:
+        for _ in range(n_threads):
+            pool.submit(hit, post_ids, n_requests // n_threads)
+    seconds = perf_counter() - start
+    print(f"{label:<30} {n_requests / seconds:8.1f} views/s")
+
+
+def bench_views(n_requests: int = 2000, n_threads: int = 4):
+    """
+    The function `bench_views` compares the throughput of `blog_posts.view` without counting views,
+    with the write-behind counter, and with a synchronous UPSERT on every view.
+    """
+    with app.app_context():
+        post_ids = [post.id for post in BlogPost.query.all()]
+    if not post_ids:
+        print("No posts in the db. Create some first.")
+        return
+    hit(post_ids, 20)  # warm up
+
+    record = view_counter.record
+
+    def synchronous(post_id: int):
+        record(post_id)
+        view_counter.flush()
+
+    view_counter.record = lambda post_id: None  # type: ignore
+    bench("no counting", post_ids, n_requests, n_threads)
+    view_counter.record = record  # type: ignore
+    bench("write-behind counter", post_ids, n_requests, n_threads)
+    view_counter.record = synchronous  # type: ignore
+    bench("UPSERT on every view", post_ids, n_requests, n_threads)
+    view_counter.record = record  # type: ignore
+    view_counter.flush()
+
+
+if __name__ == "__main__":
+    bench_views()
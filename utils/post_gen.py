@@ -1,11 +1,15 @@
-from random import choice
+import argparse
+from random import Random
 from project import app
 import json
 from project.models import User
 import requests
+from utils.seed import SeedRunner
 
 
-def create_post(base_url: str, user_id: int, post: dict[str, str]):
+def create_post(
+    base_url: str, user_id: int, post: dict[str, str], session: requests.Session | None = None
+):
     """
     The function `create_post` sends a POST request to a specified API endpoint with a user ID and a
     post dictionary as JSON data.
@@ -17,16 +21,18 @@ def create_post(base_url: str, user_id: int, post: dict[str, str]):
     creating the post
     :param post: The `post` parameter is a dictionary that contains the details of the post. It should
     have the following keys:
+    :param session: The `session` parameter is the `requests.Session` to send the request with, so its
+    connection is reused. Without it a new connection is opened.
     :return: the response object from the POST request.
     """
     api_url = "/api/createpost"
     url = base_url + api_url
     post["user_id"] = user_id  # type: ignore
-    response = requests.post(url, json=post)
+    response = (session or requests).post(url, json=post, timeout=30)
     return response
 
 
-def create_posts(base_url:str, posts_file: str):
+def create_posts(base_url:str, posts_file: str, workers: int = 8, reset: bool = False):
     """
     The function `create_posts` creates posts by randomly selecting a user ID from a list of user IDs
     and then calling the `create_post` function with the selected user ID and the post data.
@@ -35,6 +41,9 @@ def create_posts(base_url:str, posts_file: str):
     posts. It should include the protocol (e.g., "http://") and the domain name (e.g., "example.com")
     :param posts_file: The `posts_file` parameter is the file path to a JSON file that contains the
     posts data. This file should have a key called "posts" which contains a list of post objects
+    :param workers: The `workers` parameter is the number of requests sent concurrently
+    :param reset: The `reset` parameter creates every post again instead of resuming the last run,
+    which skips the posts (by position in `posts_file`) already created
     :return: The function does not explicitly return anything.
     """
     with app.app_context():
@@ -47,8 +56,20 @@ def create_posts(base_url:str, posts_file: str):
     with open(posts_file, "r") as f:
         posts = json.load(f)["posts"]
 
-    for post in posts:
-        user_id = choice(ids)
-        response = create_post(base_url,user_id,post)
-        print(response)
+    runner = SeedRunner("posts", workers=workers)
+    if reset:
+        runner.reset()
+    # Seeded by position, so a resumed run gives each post the author it would have had.
+    items = ((f"{i}", (Random(i).choice(ids), post)) for i, post in enumerate(posts))
+    runner.run(items, lambda session, item: create_post(base_url, item[0], item[1], session))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the posts of a JSON file through the API.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base url of the app")
+    parser.add_argument("--file", default="utils/posts.json", help="JSON file with a 'posts' list")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--reset", action="store_true", help="create every post again")
+    args = parser.parse_args()
+    create_posts(args.url, args.file, args.workers, args.reset)
 
@@ -0,0 +1,74 @@
+import argparse
+from datetime import timedelta
+from sqlalchemy import func, select, update
+from project import app, db
+from project.models import BlogPost, User
+from project.posts.indexing import rebuild_indexes
+
+
+def duplicated_timestamps(model) -> list[tuple]:
+    """
+    The function `duplicated_timestamps` finds the `created_at` values shared by several rows of
+    `model`. Until `created_at` got a server side default every row inserted by a worker got that
+    worker's start time, so groups of equal timestamps are the footprint of the bug.
+
+    :return: a list of (created_at, row ids ordered by id) tuples.
+    """
+    table = model.__table__
+    groups = db.session.execute(
+        select(table.c.created_at, func.group_concat(table.c.id))
+        .group_by(table.c.created_at)
+        .having(func.count() > 1)
+    ).all()
+    return [(created_at, sorted(int(i) for i in ids.split(","))) for created_at, ids in groups]
+
+
+def spread(model, groups: list[tuple]) -> int:
+    """
+    The function `spread` gives the rows of each group distinct timestamps that follow their insertion
+    (id) order: the n-th row of a group gets the shared timestamp plus n microseconds. The real
+    creation times are lost, this only makes the order of the rows correct and stable.
+
+    :return: the number of rows changed.
+    """
+    table = model.__table__
+    changed = 0
+    for created_at, ids in groups:
+        for offset, row_id in enumerate(ids[1:], start=1):
+            db.session.execute(
+                update(table)
+                .where(table.c.id == row_id)
+                .values(created_at=created_at + timedelta(microseconds=offset))
+            )
+            changed += 1
+    return changed
+
+
+def repair_timestamps(fix: bool):
+    """
+    The function `repair_timestamps` reports the users and posts sharing a `created_at` value and, when
+    `fix` is True, gives them distinct timestamps in insertion order.
+    """
+    with app.app_context():
+        found, changed = 0, 0
+        for model in (User, BlogPost):
+            groups = duplicated_timestamps(model)
+            rows = sum(len(ids) for _, ids in groups)
+            found += rows
+            print(f"{model.__tablename__}: {len(groups)} shared timestamps over {rows} rows")
+            for created_at, ids in groups:
+                print(f"  {created_at}: ids {ids}")
+            if fix and groups:
+                changed += spread(model, groups)
+        if fix:
+            rebuild_indexes()
+            db.session.commit()
+            print(f"Repaired {changed} rows.")
+        elif found:
+            print("Run with --fix to repair them.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify and repair created_at timestamps.")
+    parser.add_argument("--fix", action="store_true", help="repair the rows instead of only reporting")
+    repair_timestamps(parser.parse_args().fix)
@@ -0,0 +1,140 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import perf_counter
+from typing import Callable, Iterable
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def checkpoint_path(name: str) -> str:
+    """
+    The function `checkpoint_path` returns the file where the run `name` records the items it already
+    seeded.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f".{name}.checkpoint")
+
+
+# The `SeedRunner` class sends the requests of a seeding run from a pool of worker threads, each with
+# its own keep-alive `requests.Session`. The key of every item that succeeded is appended to a
+# checkpoint file, so an interrupted run started again skips the items already seeded.
+class SeedRunner:
+    def __init__(self, name: str, workers: int = 8, report_every: float = 2.0):
+        self.name = name
+        self.workers = workers
+        self.report_every = report_every
+        self.checkpoint = checkpoint_path(name)
+        self._local = threading.local()
+        self.ok = 0
+        self.errors = 0
+        self.statuses: dict[str, int] = {}
+
+    def session(self) -> requests.Session:
+        """
+        The function returns the `requests.Session` of the calling worker thread, reusing its
+        connections between requests.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return session
+
+    def done_keys(self) -> set[str]:
+        """
+        The function returns the keys of the items seeded by previous runs.
+        """
+        if not os.path.exists(self.checkpoint):
+            return set()
+        with open(self.checkpoint) as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def reset(self):
+        """
+        The function deletes the checkpoint, so the next run seeds every item again.
+        """
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def _report(self, start: float, final: bool = False):
+        seconds = perf_counter() - start
+        total = self.ok + self.errors
+        rate = total / seconds if seconds else 0.0
+        error_rate = self.errors / total if total else 0.0
+        statuses = " ".join(f"{status}={count}" for status, count in sorted(self.statuses.items()))
+        label = "done" if final else "progress"
+        print(
+            f"[{self.name}] {label}: {total} requests in {seconds:.1f}s, {rate:.1f} req/s, "
+            f"errors {error_rate:.1%} ({statuses})"
+        )
+
+    def run(
+        self,
+        items: Iterable[tuple[str, object]],
+        send: Callable[[requests.Session, object], requests.Response],
+        on_success: Callable[[object, requests.Response], None] | None = None,
+    ) -> bool:
+        """
+        The function sends every (key, item) of `items` not seeded yet with `send(session, item)`.
+
+        A response with a 2xx status, or 409 (the item already exists), counts as seeded and its key is
+        checkpointed; other statuses and exceptions count as errors and are retried by the next run.
+        `on_success` is called from the calling thread, so it can write to files without locking.
+
+        :return: True when every item is seeded, False when some failed and are left to the next run.
+        """
+        done = self.done_keys()
+        pending = [(key, item) for key, item in items if key not in done]
+        if done:
+            print(f"[{self.name}] resuming: {len(done)} items already seeded, {len(pending)} left")
+        start = last_report = perf_counter()
+        with open(self.checkpoint, "a") as checkpoint, ThreadPoolExecutor(self.workers) as pool:
+            queue = iter(pending)
+            running = {}
+            try:
+                while True:
+                    # Keep at most two requests per worker in flight instead of submitting everything.
+                    for key, item in queue:
+                        running[pool.submit(self._send, send, item)] = (key, item)
+                        if len(running) >= 2 * self.workers:
+                            break
+                    if not running:
+                        break
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        key, item = running.pop(future)
+                        self._record(future, key, item, checkpoint, on_success)
+                    if perf_counter() - last_report >= self.report_every:
+                        last_report = perf_counter()
+                        self._report(start)
+            except KeyboardInterrupt:
+                print(f"[{self.name}] interrupted, run again to resume")
+                for future in running:
+                    future.cancel()
+                raise
+            finally:
+                self._report(start, final=True)
+        return self.errors == 0
+
+    def _send(self, send, item) -> requests.Response:
+        # Runs in a worker thread, so `session` is the session of that thread.
+        return send(self.session(), item)
+
+    def _record(self, future, key: str, item, checkpoint, on_success):
+        try:
+            response = future.result()
+        except requests.RequestException as e:
+            self.errors += 1
+            status = type(e).__name__
+        else:
+            status = str(response.status_code)
+            if response.ok or response.status_code == 409:
+                self.ok += 1
+                checkpoint.write(key + "\n")
+                checkpoint.flush()
+                if on_success:
+                    on_success(item, response)
+            else:
+                self.errors += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
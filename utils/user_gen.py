@@ -1,5 +1,8 @@
-from time import sleep
+import argparse
+import json
+import os
 import requests
+from utils.seed import SeedRunner, checkpoint_path
 
 
 def get_users_json(api_url: str) -> list[dict[str, str | dict[str, str]]]:
@@ -52,7 +55,9 @@ def parse_user_json(json: dict) -> dict[str, str | None]:
     }
 
 
-def generate_user(user: dict[str, str | None], base_url: str) -> requests.Response:
+def generate_user(
+    user: dict[str, str | None], base_url: str, session: requests.Session | None = None
+) -> requests.Response:
     """
     The function generates a user by sending a POST request to a specified URL with user data in JSON
     format.
@@ -61,33 +66,68 @@ def generate_user(user: dict[str, str | None], base_url: str) -> requests.Respon
     :param base_url: The `base_url` parameter is a string that represents the base URL of the API endpoint where
     the user will be created. It should include the protocol (e.g., "http://" or "https://") and the
     domain name (e.g., "example.com")
+    :param session: The `session` parameter is the `requests.Session` to send the request with, so its
+    connection is reused. Without it a new connection is opened.
     :return: the response from the POST request made to the specified URL with the user data as JSON.
     """
     base_url = base_url + "/api/createuser"
-    response = requests.post(base_url, json=user)
+    response = (session or requests).post(base_url, json=user, timeout=30)
     return response
 
-def create_users(base_url: str, n_users: int):
+
+def create_users(base_url: str, n_users: int, workers: int = 8, reset: bool = False):
     """
     The `create_users` function generates random users using the RandomUser API, parses the user data,
-    generates a user using the `generate_user` function, and saves the user information to a file.
-    
+    creates them concurrently with the `generate_user` function, and saves the user information to a
+    file.
+
+    The fetched users are kept next to the checkpoint of the run, so an interrupted run started again
+    creates the same users it had not created yet instead of fetching new ones. Both files are removed
+    once every user is created, so the next run fetches `n_users` new users.
+
     :param base_url: The `base_url` parameter is the base URL of the API or website where you want to
     create the users. It is the URL that will be used as the endpoint to send the user creation requests
-    :param n_users: The `n_users` parameter is the number of random users you want to create. It
-    determines how many API calls will be made to the randomuser API to generate the users
+    :param n_users: The `n_users` parameter is the number of random users you want to create. It is only
+    used when no interrupted run is pending
+    :param workers: The `workers` parameter is the number of requests sent concurrently
+    :param reset: The `reset` parameter forgets the pending run and fetches `n_users` new users
     """
-    api_url = f"https://randomuser.me/api/?results={n_users}"
-    results = get_users_json(api_url)
-    for result in results:
-        user = parse_user_json(result)
-        response = generate_user(user, base_url)
-        with open("generated_users.txt", "a") as f:
-            f.write(f"{user['email']} | {user['password']} | {user['picture_url']}\n")
-        print(response)
-        #! Needed so the randomuser api doesn't block the conection
-        sleep(1)
+    runner = SeedRunner("users", workers=workers)
+    pending_path = checkpoint_path("users") + ".json"
+    if reset or not os.path.exists(pending_path):
+        runner.reset()
+        # Profile pictures are downloaded later by the job workers, so the users can be created as
+        # fast as the app accepts them.
+        results = get_users_json(f"https://randomuser.me/api/?results={n_users}")
+        users = [parse_user_json(result) for result in results]
+        with open(pending_path, "w") as f:
+            json.dump(users, f)
+    with open(pending_path) as f:
+        users = json.load(f)
+
+    generated_users = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_users.txt")
+    with open(generated_users, "a") as out:
+
+        def saved(user, response):
+            out.write(f"{user['email']} | {user['password']} | {user['picture_url']}\n")
+
+        completed = runner.run(
+            ((user["email"], user) for user in users),
+            lambda session, user: generate_user(user, base_url, session),
+            saved,
+        )
+    if completed:
+        runner.reset()
+        os.remove(pending_path)
+    else:
+        print(f"[users] {runner.errors} users failed, run again to retry them")
+
 
 if __name__ == "__main__":
-    base_url = "http://127.0.0.1:5000"
-    create_users(base_url, 5)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create random users through the API.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base url of the app")
+    parser.add_argument("-n", "--users", type=int, default=5, help="users to create")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--reset", action="store_true", help="start a new run instead of resuming")
+    args = parser.parse_args()
+    create_users(args.url, args.users, args.workers, args.reset)
\ No newline at end of file